@@ -7,7 +7,6 @@ sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
 # --- End of Hack ---
 
 import os
-import math
 import re
 import streamlit as st
 import pandas as pd
@@ -16,10 +15,10 @@ from sentence_transformers import SentenceTransformer
 
 # Import all necessary functions from our other modules
 from database import (
-    SessionLocal,
     get_all_progress_items,
-    FollowedTerm,
-    CorrectionFlag,
+    get_followed_terms,
+    add_followed_term,
+    add_correction_flag,
     delete_followed_term  # Import the new delete function
 )
 from ui_components import render_progress_card
@@ -38,7 +37,21 @@ LOCAL_MODEL_PATH = '/app/models/all-MiniLM-L6-v2'
 @st.cache_resource
 def get_embedding_model():
     print("Loading embedding model from local path...")
-    return SentenceTransformer(LOCAL_MODEL_PATH)
+    import torch
+    model = SentenceTransformer(LOCAL_MODEL_PATH, device='cpu')
+    # Single short-query encodes are matmul-bound: cap threads to avoid
+    # oversubscribing the Streamlit container, and dynamically quantize the
+    # Linear layers to int8 (2-4x on CPU, negligible cosine-recall loss).
+    torch.set_num_threads(max(1, (os.cpu_count() or 2) // 2))
+    try:
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        print("Embedding model quantized to int8 for CPU inference.")
+    except Exception as e:
+        print(f"WARN: int8 quantization unavailable, using FP32 model: {e}")
+    # Warm up inside the cached factory so one-time lazy init (tokenizer,
+    # kernel selection) is paid here, not on the first user query.
+    model.encode("warmup", convert_to_numpy=True)
+    return model
 
 @st.cache_resource
 def get_chroma_client():
@@ -47,16 +60,72 @@ def get_chroma_client():
     CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8000"))
     return chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
 
+@st.cache_resource
+def get_progress_collection():
+    client = get_chroma_client()
+    return client.get_or_create_collection(
+        name="ai_progress",
+        metadata={"hnsw:space": "cosine", "hnsw:M": 24, "hnsw:construction_ef": 128, "hnsw:search_ef": 100},
+    )
+
 @st.cache_data(ttl=60)
 def load_data():
     print("Loading data from PostgreSQL...")
-    return get_all_progress_items()
+    df = pd.DataFrame(get_all_progress_items())
+    if df.empty:
+        return df
+    # Dtype coercions live inside the cache so reruns get ready-to-use
+    # columns instead of re-parsing dates and re-casting ids each time.
+    df['id'] = df['id'].astype(str)
+    df['published_date'] = pd.to_datetime(df['published_date'], errors='coerce', cache=True)
+    # Categorical source: the sidebar reads the sorted categories in O(1)
+    # and the column stores integer codes instead of repeated strings.
+    df['source'] = df['source'].astype('category')
+    # Derived search columns, built once per cache refresh instead of per
+    # keystroke: the keyword and My Feed filters scan a single pre-lowered
+    # column rather than re-lowercasing title + keywords on every rerun.
+    df['title_lc'] = df['title'].astype(str).str.lower()
+    # Join keyword lists with spaces rather than str()-ing them, so matches
+    # aren't polluted by list brackets/quotes.
+    df['kw_lc'] = df['keywords'].apply(
+        lambda ks: ' '.join(ks).lower() if isinstance(ks, list) else str(ks).lower()
+    )
+    df['combined_lc'] = df['title_lc'] + ' ' + df['kw_lc']
+    return df
+
+@st.cache_data(ttl=3600, max_entries=512, show_spinner=False)
+def embed_query(text: str) -> list[float]:
+    """Encodes a search query, memoized so reruns with the same query skip the model."""
+    model = get_embedding_model()
+    return model.encode(text, convert_to_numpy=True, normalize_embeddings=True).tolist()
+
+@st.cache_resource
+def compile_terms(terms: tuple):
+    """Compiles the My Feed alternation once per distinct set of terms."""
+    return re.compile('|'.join(map(re.escape, terms)))
+
+@st.cache_data(ttl=30, show_spinner=False)
+def load_followed_terms() -> list:
+    """Followed terms change rarely; cache briefly and clear on add/delete."""
+    return get_followed_terms()
+
+@st.cache_data(ttl=300, max_entries=64, show_spinner=False)
+def chroma_semantic_query(query: str, n_results: int) -> tuple[list, list]:
+    """Runs the vector search and returns (ids, distances), memoized so
+    pagination/filter reruns skip the embedding pass and the Chroma HTTP hop."""
+    query_embedding = embed_query(query)
+    results = get_progress_collection().query(
+        query_embeddings=[query_embedding],
+        n_results=n_results,
+        include=["distances"],
+    )
+    return results['ids'][0], results['distances'][0]
 
 # --- 3. Initialization ---
-model = get_embedding_model()
-client = get_chroma_client()
-progress_collection = client.get_or_create_collection(name="ai_progress")
-all_data = load_data()
+# The embedding model and Chroma connection are deliberately NOT touched here:
+# they are multi-second cold starts that only the semantic-search branch needs,
+# and @st.cache_resource already guarantees one-time setup on first use.
+df = load_data()
 
 # Initialize session state for BOTH tabs' pagination independently
 if "all_progress_page" not in st.session_state:
@@ -107,7 +176,7 @@ with st.sidebar:
         sort_options.insert(0, "Relevance")
     sort_key = st.selectbox("Sort by", options=sort_options, index=0)
     
-    all_sources = sorted(list(set(item['source'] for item in all_data))) if all_data else []
+    all_sources = list(df['source'].cat.categories) if not df.empty else []
     selected_sources = st.multiselect("Filter by Source", options=all_sources, default=all_sources)
 
     st.divider()
@@ -117,44 +186,37 @@ with st.sidebar:
     # --- Term Management UI ---
     st.divider()
     st.header("Manage My Feed")
-    db = SessionLocal()
-    try:
-        followed_terms = [row.term for row in db.query(FollowedTerm.term).all()]
-        if not followed_terms:
-            st.caption("Not following any terms yet.")
-        else:
-            for term in followed_terms:
-                term_col, button_col = st.columns([4, 1])
-                term_col.write(f"• `{term}`")
-                if button_col.button("❌", key=f"delete_term_{term}", help=f"Stop following '{term}'"):
-                    delete_followed_term(term)
-                    st.rerun()
-        
-        with st.form("follow_form", clear_on_submit=True):
-            new_term = st.text_input("Follow a new keyword/author:")
-            submitted = st.form_submit_button("Follow Term")
-            if submitted and new_term:
-                term_exists = db.query(FollowedTerm).filter(FollowedTerm.term == new_term.lower()).first()
-                if not term_exists:
-                    db.add(FollowedTerm(term=new_term.lower()))
-                    db.commit()
-                    st.rerun()
-    finally:
-        db.close()
+    # Cached and reused by the My Feed tab below: reruns skip the Postgres
+    # round-trip entirely until a term is added/removed or the TTL lapses.
+    followed_terms = load_followed_terms()
+    if not followed_terms:
+        st.caption("Not following any terms yet.")
+    else:
+        for term in followed_terms:
+            term_col, button_col = st.columns([4, 1])
+            term_col.write(f"• `{term}`")
+            if button_col.button("❌", key=f"delete_term_{term}", help=f"Stop following '{term}'"):
+                delete_followed_term(term)
+                load_followed_terms.clear()
+                st.rerun()
+
+    with st.form("follow_form", clear_on_submit=True):
+        new_term = st.text_input("Follow a new keyword/author:")
+        submitted = st.form_submit_button("Follow Term")
+        if submitted and new_term:
+            if add_followed_term(new_term):
+                load_followed_terms.clear()
+                st.rerun()
 
 
 # --- 5. Main App ---
 st.title("🧠 The AI Progress Sentinel")
 st.caption("AI-Powered Summaries & Rankings of AI Progress. Continuously Updated.")
 
-if not all_data:
+if df.empty:
     st.warning("The database is currently empty. Please wait for the scraper to populate it.")
     st.stop()
 
-df = pd.DataFrame(all_data)
-df['id'] = df['id'].astype(str)
-df['published_date'] = pd.to_datetime(df['published_date'], errors='coerce')
-
 
 # --- Reusable Display Function ---
 def process_and_display_feed(input_df: pd.DataFrame, tab_key_prefix: str):
@@ -164,28 +226,38 @@ def process_and_display_feed(input_df: pd.DataFrame, tab_key_prefix: str):
     results_df = input_df
     if semantic_query:
         with st.spinner("Performing semantic search..."):
-            query_embedding = model.encode(semantic_query).tolist()
-            results = progress_collection.query(query_embeddings=[query_embedding], n_results=50)
-            relevant_ids = results['ids'][0]
-            if not relevant_ids:
+            # Recall scales with the page size (source/keyword filters may discard
+            # hits), and we only need ids + distances back over the wire.
+            n_results = min(max(st.session_state.page_size * 5, 50), 500)
+            relevant_ids, distances = chroma_semantic_query(semantic_query, n_results)
+            # Intersect the <=n_results hit ids against the id index with O(k)
+            # hash probes — never scan the full frame — then pull the surviving
+            # rows in Chroma's distance order via a single reindex.
+            df_by_id = df.set_index('id', drop=False)
+            hits = [(i, d) for i, d in zip(relevant_ids, distances) if i in df_by_id.index]
+            if not hits:
                 results_df = pd.DataFrame(columns=df.columns)
             else:
-                results_df = df[df['id'].isin(relevant_ids)].copy()
-                relevance_scores = {id_str: dist for id_str, dist in zip(results['ids'][0], results['distances'][0])}
-                results_df['relevance'] = results_df['id'].map(relevance_scores)
+                results_df = df_by_id.reindex([i for i, _ in hits])
+                results_df['relevance'] = [d for _, d in hits]
     
-    if selected_sources:
+    # The default is "all sources selected" — filtering then is a no-op, so
+    # skip the full-column isin scan unless the user actually narrowed it.
+    if selected_sources and len(selected_sources) != len(all_sources):
         results_df = results_df[results_df['source'].isin(selected_sources)]
     if search_term:
         term_lower = search_term.lower()
-        results_df = results_df[results_df.apply(
-            lambda row: term_lower in str(row['title']).lower() or term_lower in str(row['keywords']).lower(),
-            axis=1
-        )]
+        # Vectorized substring match (regex=False takes the C fast path) over
+        # the pre-lowered combined title+keywords column.
+        mask = results_df['combined_lc'].str.contains(term_lower, regex=False, na=False)
+        results_df = results_df[mask]
     
     # Sorting Logic
     if sort_key == "Relevance" and 'relevance' in results_df.columns:
-        sorted_df = results_df.sort_values('relevance', ascending=True)
+        # Rows come out of the semantic branch already in Chroma's distance
+        # order, and the source/keyword filters preserve row order, so the
+        # relevance sort is a no-op — skip the O(n log n) pass.
+        sorted_df = results_df
     elif sort_key == "Importance Score":
         sorted_df = results_df.sort_values('overall_importance_score', ascending=False)
     else:
@@ -194,7 +266,7 @@ def process_and_display_feed(input_df: pd.DataFrame, tab_key_prefix: str):
     # Pagination Logic
     total_items = len(sorted_df)
     page_size = st.session_state.page_size
-    total_pages = math.ceil(total_items / page_size) if page_size > 0 else 1
+    total_pages = (total_items + page_size - 1) // page_size if page_size > 0 else 1
     if st.session_state.get(page_number_key, 1) > total_pages:
         st.session_state[page_number_key] = 1
     
@@ -205,12 +277,19 @@ def process_and_display_feed(input_df: pd.DataFrame, tab_key_prefix: str):
     # Pagination UI
     st.subheader(f"Showing {len(paginated_df)} of {total_items} breakthroughs")
     p_col1, p_col2, p_col3, p_col4 = st.columns([2, 2, 1, 5])
-    if p_col1.button("⬅️ Previous", use_container_width=True, disabled=(st.session_state[page_number_key] <= 1), key=f"prev_{tab_key_prefix}"):
-        st.session_state[page_number_key] -= 1
-        st.rerun()
-    if p_col2.button("Next ➡️", use_container_width=True, disabled=(st.session_state[page_number_key] >= total_pages), key=f"next_{tab_key_prefix}"):
-        st.session_state[page_number_key] += 1
-        st.rerun()
+    # Button clicks already trigger a rerun; calling st.rerun() here doubled
+    # every data load and semantic search per click. Mutate state via
+    # on_click callbacks, which run before the automatic rerun.
+    p_col1.button(
+        "⬅️ Previous", use_container_width=True,
+        disabled=(st.session_state[page_number_key] <= 1), key=f"prev_{tab_key_prefix}",
+        on_click=lambda k=page_number_key: st.session_state.update({k: st.session_state[k] - 1}),
+    )
+    p_col2.button(
+        "Next ➡️", use_container_width=True,
+        disabled=(st.session_state[page_number_key] >= total_pages), key=f"next_{tab_key_prefix}",
+        on_click=lambda k=page_number_key: st.session_state.update({k: st.session_state[k] + 1}),
+    )
     p_col3.number_input("Page", min_value=1, max_value=total_pages or 1, key=page_number_key, label_visibility="collapsed")
     p_col4.markdown(f"<div style='text-align: right; padding-top: 10px;'>Page {st.session_state[page_number_key]} of {total_pages}</div>", unsafe_allow_html=True)
     st.divider()
@@ -219,9 +298,11 @@ def process_and_display_feed(input_df: pd.DataFrame, tab_key_prefix: str):
     if paginated_df.empty:
         st.info("No results match your criteria.")
     else:
-        for _, item in paginated_df.iterrows():
+        # One C-level batch conversion instead of boxing each row into a
+        # Series via iterrows() and re-converting it per card.
+        for item in paginated_df.to_dict(orient='records'):
             card_container = st.container(border=True)
-            render_progress_card(item.to_dict(), card_container, lang_code=st.session_state.display_language, key_prefix=f"{tab_key_prefix}_{item['id']}")
+            render_progress_card(item, card_container, lang_code=st.session_state.display_language, key_prefix=f"{tab_key_prefix}_{item['id']}")
             
             # Flagging logic
             if st.session_state.get(f"flagging_item_id_{tab_key_prefix}_{item['id']}") == item['id']:
@@ -231,14 +312,8 @@ def process_and_display_feed(input_df: pd.DataFrame, tab_key_prefix: str):
                     comment = st.text_area("Optional Comment:", key=f"comment_{tab_key_prefix}_{item['id']}")
                     submitted = st.form_submit_button("Submit Flag")
                     if submitted:
-                        db = SessionLocal()
-                        try:
-                            new_flag = CorrectionFlag(item_id=int(item['id']), reason=reason, user_comment=comment)
-                            db.add(new_flag)
-                            db.commit()
+                        if add_correction_flag(int(item['id']), reason, comment):
                             st.success("Flag submitted!")
-                        finally:
-                            db.close()
                         del st.session_state[f"flagging_item_id_{tab_key_prefix}_{item['id']}"]
                         st.rerun()
 
@@ -249,22 +324,21 @@ with tab_all:
     process_and_display_feed(df, tab_key_prefix="all_progress")
 
 with tab_feed:
-    db = SessionLocal()
-    followed_terms = [row.term for row in db.query(FollowedTerm.term).all()]
-    db.close()
-
+    # Reuse the list already fetched for the sidebar this rerun.
     if not followed_terms:
         st.info("You are not following any terms. Add some in the sidebar to create your personalized feed.")
     else:
         try:
-            pattern = '|'.join(map(re.escape, followed_terms))
-            my_feed_df = df[df.apply(
-                lambda row: bool(
-                    re.search(pattern, str(row['title']).lower()) or
-                    re.search(pattern, str(row['keywords']).lower())
-                ), 
-                axis=1
-            )]
+            # Terms are stored lowercase, so matching against the pre-lowered
+            # combined column lets us skip IGNORECASE; the compiled alternation
+            # is applied in one vectorized pass instead of re.search per row.
+            # A single term takes the plain-substring C fast path, no regex at all.
+            if len(followed_terms) == 1:
+                mask = df['combined_lc'].str.contains(followed_terms[0], regex=False, na=False)
+            else:
+                pattern_re = compile_terms(tuple(sorted(followed_terms)))
+                mask = df['combined_lc'].str.contains(pattern_re, na=False)
+            my_feed_df = df[mask]
             process_and_display_feed(my_feed_df, tab_key_prefix="my_feed")
         except re.error as e:
             st.error(f"Could not process followed terms due to a regular expression error: {e}")
\ No newline at end of file
@@ -3,9 +3,10 @@
 import os
 import json
 import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, JSON, Boolean, ForeignKey
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, JSON, Boolean, ForeignKey, cast, text, select, literal, func
+from sqlalchemy.orm import sessionmaker, declarative_base, relationship
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -15,9 +16,20 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL not found. Please set it in your .env file.")
 
-# Create the SQLAlchemy engine and session factory
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Create the SQLAlchemy engine and session factory.
+# A persistent pool amortizes TCP/auth setup across the many short-lived
+# sessions opened by Streamlit reruns and Celery tasks; pre_ping discards
+# stale sockets after idle periods and recycle stays under common server
+# idle timeouts. expire_on_commit=False avoids a reload round-trip when
+# objects are read right after commit (e.g. add_progress_item).
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=10,
+    max_overflow=20,
+    pool_pre_ping=True,
+    pool_recycle=1800,
+)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 Base = declarative_base()
 
 
@@ -77,6 +89,10 @@ class ParserProposal(Base):
     status = Column(String, default='pending_review', index=True) # pending_review, approved, rejected
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
+    # Lets consumers eager-load the owning source (joinedload) instead of
+    # issuing a per-proposal SELECT.
+    source = relationship("Source")
+
 # --- Database Utility Functions ---
 
 def create_all_tables():
@@ -84,69 +100,218 @@ def create_all_tables():
     print("DATABASE: Creating all tables...")
     Base.metadata.create_all(bind=engine)
     print("DATABASE: Tables created successfully (if they didn't exist).")
+    # Trigram index so the ILIKE keyword filter in get_progress_items stays
+    # index-backed as the table grows. Best-effort: skipped if the pg_trgm
+    # extension cannot be installed (e.g. on a non-superuser connection).
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            # Indexed on the bare column: pg_trgm GIN serves ILIKE directly,
+            # whereas an index on lower(title) would only match queries that
+            # spell out that exact expression — which the ILIKE filter in
+            # get_progress_items does not.
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_progress_items_title_trgm "
+                "ON progress_items USING gin (title gin_trgm_ops)"
+            ))
+            # Same treatment for the keywords arm of the ILIKE filter; the
+            # expression mirrors the cast used in get_progress_items.
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_progress_items_keywords_trgm "
+                "ON progress_items USING gin (((analysis_data->'keywords')::text) gin_trgm_ops)"
+            ))
+        print("DATABASE: Trigram index for keyword search is in place.")
+    except Exception as e:
+        print(f"DATABASE: WARN - Could not create trigram index (pg_trgm unavailable?): {e}")
+    # Expression index backing the 'importance' sort in get_progress_items,
+    # and a descending date index backing the default sort + page window.
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_progress_items_importance "
+                "ON progress_items "
+                "(((analysis_data->'ranking'->>'overall_importance_score')::float) DESC NULLS LAST)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_progress_items_published_date_desc "
+                "ON progress_items (published_date DESC NULLS LAST)"
+            ))
+        print("DATABASE: Sort indexes are in place.")
+    except Exception as e:
+        print(f"DATABASE: WARN - Could not create sort indexes: {e}")
+    # Partial composite index for the admin flag-review query, which filters
+    # status = 'pending' and orders by created_at DESC: rows come back from an
+    # index scan already sorted, and the index only stores pending flags.
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_correction_flags_pending_created "
+                "ON correction_flags (status, created_at DESC) "
+                "WHERE status = 'pending'"
+            ))
+        print("DATABASE: Pending-flags index is in place.")
+    except Exception as e:
+        print(f"DATABASE: WARN - Could not create pending-flags index: {e}")
 
-def add_progress_item(item_data: dict):
+def add_progress_items_bulk(items: list):
     """
-    Adds a newly fetched and analyzed item to the database.
-    Handles data extraction from the combined dictionary.
-    
-    Returns: The newly created ProgressItem object or None.
+    Inserts many analyzed items in a single INSERT ... ON CONFLICT DO NOTHING
+    statement — one round-trip and one transaction instead of one per item,
+    with duplicates resolved atomically by the unique entry_id index.
+
+    Returns: A dict mapping entry_id -> new primary key for the rows that
+             were actually inserted (duplicates are absent).
     """
+    if not items:
+        return {}
     db = SessionLocal()
     try:
-        new_item = ProgressItem(
-            entry_id=item_data['entry_id'],
-            title=item_data.get('title', 'Untitled'),
-            url=item_data['url'],
-            source=item_data['source'],
-            published_date=item_data['published_date'],
-            analysis_data=item_data['analysis_data']
+        rows = [
+            {
+                'entry_id': item['entry_id'],
+                'title': item.get('title', 'Untitled'),
+                'url': item['url'],
+                'source': item['source'],
+                'published_date': item['published_date'],
+                'analysis_data': item['analysis_data'],
+            }
+            for item in items
+        ]
+        stmt = (
+            pg_insert(ProgressItem)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=['entry_id'])
+            .returning(ProgressItem.id, ProgressItem.entry_id)
         )
-        db.add(new_item)
+        inserted = db.execute(stmt).all()
         db.commit()
-        db.refresh(new_item)
-        print(f"DATABASE: Successfully added '{new_item.title}' to the database.")
-        return new_item
-    except IntegrityError:
-        db.rollback()
-        print(f"DATABASE: Item with entry_id '{item_data['entry_id']}' already exists. Skipping.")
-        return None
+        print(f"DATABASE: Bulk insert stored {len(inserted)} of {len(items)} items.")
+        return {entry_id: item_id for item_id, entry_id in inserted}
     except Exception as e:
         db.rollback()
-        print(f"DATABASE: An unexpected error occurred while adding an item: {e}")
-        return None
+        print(f"DATABASE: An unexpected error occurred during bulk insert: {e}")
+        return {}
     finally:
         db.close()
 
-def get_all_progress_items():
+def add_progress_item(item_data: dict):
     """
-    Fetches all items and flattens the NEW multi-lingual structure for the UI.
+    Adds a newly fetched and analyzed item to the database.
+    Thin wrapper over the bulk upsert path.
+
+    Returns: The new item's id, or None if it already existed or failed.
+    """
+    inserted = add_progress_items_bulk([item_data])
+    new_id = inserted.get(item_data['entry_id'])
+    if new_id is None:
+        print(f"DATABASE: Item with entry_id '{item_data['entry_id']}' already exists or failed. Skipping.")
+        return None
+    print(f"DATABASE: Successfully added '{item_data.get('title', 'Untitled')}' to the database.")
+    return new_id
+
+# Server-side projection of the flattened fields: PostgreSQL's JSON operators
+# extract them in C and the rows come back already flat, so no ORM objects are
+# hydrated and no per-row Python dict walking happens on load.
+# published_date stays the driver-decoded datetime (or None): converting to
+# datetime64 from real datetimes is a buffer copy, while mixed date/'N/A'
+# strings would force the slow per-element parse in pandas.
+_FLAT_COLUMNS = (
+    ProgressItem.id,
+    ProgressItem.url,
+    ProgressItem.source,
+    ProgressItem.published_date,
+    # Full rich object for the UI; coalesced so callers never see NULL.
+    func.coalesce(ProgressItem.analysis_data, text("'{}'::json")).label('analysis_data'),
+    # Flattened fields for searching/sorting, always from English
+    func.coalesce(ProgressItem.analysis_data['en']['title'].as_string(), 'Untitled').label('title'),
+    func.coalesce(ProgressItem.analysis_data['keywords'], text("'[]'::json")).label('keywords'),
+    func.coalesce(
+        ProgressItem.analysis_data['ranking']['overall_importance_score'].as_float(), 0.0
+    ).label('overall_importance_score'),
+)
+
+def get_progress_items(sources=None, keyword=None, ids=None, order_by="date", limit=None, offset=None):
+    """
+    Fetches progress items with filtering, ordering and paging pushed down to
+    PostgreSQL, so callers only pay for the rows they will actually show.
+
+    Args:
+        sources: Optional list of source names (`source = ANY(...)`).
+        keyword: Optional substring matched case-insensitively against the
+                 title and the analysis keywords (index-backed ILIKE).
+        ids: Optional list of item ids to restrict to (e.g. from ChromaDB).
+        order_by: 'date' (default), 'importance', or 'relevance' (preserves
+                  the order of `ids`, i.e. ChromaDB's distance ranking).
+        limit/offset: Optional SQL-side page window.
+
+    Returns: A list of flattened item dicts (same shape as get_all_progress_items).
     """
     db = SessionLocal()
     try:
-        items = db.query(ProgressItem).order_by(ProgressItem.published_date.desc()).all()
-        results = []
-        for item in items:
-            analysis = item.analysis_data or {}
-            ranking = analysis.get('ranking', {})
-            
-            flat_item = {
-                "id": item.id,
-                "url": item.url,
-                "source": item.source,
-                "published_date": item.published_date.date() if item.published_date else 'N/A',
-                "analysis_data": analysis, # Pass the full rich object to the UI
-                
-                # Flattened fields for searching/sorting, always from English
-                "title": analysis.get('en', {}).get('title', 'Untitled'),
-                "keywords": analysis.get('keywords', []),
-                "overall_importance_score": float(ranking.get('overall_importance_score', 0.0)),
-            }
-            results.append(flat_item)
-        return results
+        stmt = select(*_FLAT_COLUMNS)
+        if sources:
+            stmt = stmt.where(ProgressItem.source.in_(sources))
+        if keyword:
+            pattern = f"%{keyword}%"
+            stmt = stmt.where(
+                ProgressItem.title.ilike(pattern)
+                | cast(ProgressItem.analysis_data['keywords'], Text).ilike(pattern)
+            )
+        if ids:
+            ids = [int(i) for i in ids]
+            stmt = stmt.where(ProgressItem.id.in_(ids))
+
+        if order_by == "relevance" and ids:
+            # Keep the caller-supplied (vector-search) ranking.
+            stmt = stmt.order_by(text("array_position(:id_order, id)").bindparams(id_order=ids))
+        elif order_by == "importance":
+            # nullslast for the same reason as the date sort below: the
+            # backing index is DESC NULLS LAST.
+            stmt = stmt.order_by(
+                ProgressItem.analysis_data['ranking']['overall_importance_score']
+                .as_float().desc().nullslast()
+            )
+        else:
+            # nullslast matches the DESC NULLS LAST index (plain DESC would
+            # be NULLS FIRST and unplannable against it) and keeps undated
+            # rows off page 1 of the feed.
+            stmt = stmt.order_by(ProgressItem.published_date.desc().nullslast())
+
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        if offset:
+            stmt = stmt.offset(offset)
+
+        return [dict(row) for row in db.execute(stmt).mappings().all()]
+    finally:
+        db.close()
+
+def count_progress_items(sources=None, keyword=None, ids=None):
+    """Counts items matching the same filters as get_progress_items, so a
+    paginated caller can size its page controls without fetching rows."""
+    db = SessionLocal()
+    try:
+        stmt = select(func.count(ProgressItem.id))
+        if sources:
+            stmt = stmt.where(ProgressItem.source.in_(sources))
+        if keyword:
+            pattern = f"%{keyword}%"
+            stmt = stmt.where(
+                ProgressItem.title.ilike(pattern)
+                | cast(ProgressItem.analysis_data['keywords'], Text).ilike(pattern)
+            )
+        if ids:
+            stmt = stmt.where(ProgressItem.id.in_([int(i) for i in ids]))
+        return db.execute(stmt).scalar() or 0
     finally:
         db.close()
 
+def get_all_progress_items():
+    """
+    Fetches all items and flattens the NEW multi-lingual structure for the UI.
+    """
+    return get_progress_items()
+
 def get_all_sources():
     """Fetches all sources from the database."""
     db = SessionLocal()
@@ -156,21 +321,24 @@ def get_all_sources():
         db.close()
 
 def add_new_source(name: str, url: str, source_type: str):
-    """Adds a new source to the database."""
+    """Adds a new source to the database (atomic upsert, no pre-check query)."""
     db = SessionLocal()
     try:
-        # Check if source already exists to prevent duplicates
-        exists = db.query(Source).filter((Source.name == name) | (Source.url == url)).first()
-        if exists:
+        # The unique constraints on name and url resolve duplicates in SQL;
+        # DO NOTHING means an existing source simply yields no returned row.
+        stmt = (
+            pg_insert(Source)
+            .values(name=name, url=url, source_type=source_type, is_active=True)
+            .on_conflict_do_nothing()
+            .returning(Source.id)
+        )
+        new_id = db.execute(stmt).scalar()
+        db.commit()
+        if new_id is None:
             print(f"DATABASE: Source '{name}' or URL '{url}' already exists.")
             return None
-        
-        new_source = Source(name=name, url=url, source_type=source_type, is_active=True)
-        db.add(new_source)
-        db.commit()
-        db.refresh(new_source)
         print(f"DATABASE: Successfully added new source '{name}'.")
-        return new_source
+        return new_id
     except Exception as e:
         db.rollback()
         print(f"DATABASE: Error adding new source: {e}")
@@ -218,6 +386,47 @@ def delete_source(source_id: int):
     finally:
         db.close()
 
+def get_followed_terms():
+    """Fetches all followed terms as plain strings (no ORM row objects)."""
+    db = SessionLocal()
+    try:
+        # Sorted in SQL: the unique index on term makes this an index-only scan.
+        return db.execute(select(FollowedTerm.term).order_by(FollowedTerm.term)).scalars().all()
+    finally:
+        db.close()
+
+def add_followed_term(term: str):
+    """Adds a followed term if it does not exist yet. Returns True if added."""
+    db = SessionLocal()
+    try:
+        # Single atomic upsert: the unique index on term enforces idempotency
+        # without a separate existence-check round-trip.
+        result = db.execute(
+            pg_insert(FollowedTerm).values(term=term.lower()).on_conflict_do_nothing(index_elements=['term'])
+        )
+        db.commit()
+        return bool(result.rowcount)
+    except Exception as e:
+        db.rollback()
+        print(f"DATABASE: Error adding followed term: {e}")
+        return False
+    finally:
+        db.close()
+
+def add_correction_flag(item_id: int, reason: str, user_comment: str = None):
+    """Stores a user-submitted correction flag. Returns True on success."""
+    db = SessionLocal()
+    try:
+        db.add(CorrectionFlag(item_id=item_id, reason=reason, user_comment=user_comment))
+        db.commit()
+        return True
+    except Exception as e:
+        db.rollback()
+        print(f"DATABASE: Error adding correction flag: {e}")
+        return False
+    finally:
+        db.close()
+
 def delete_followed_term(term_to_delete: str):
     """Deletes a followed term from the database."""
     db = SessionLocal()
@@ -1,7 +1,11 @@
 # health.py
 
+import functools
 import os
+import threading
+import time
 import psutil
+from concurrent.futures import ThreadPoolExecutor
 from redis import Redis, exceptions as redis_exceptions
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import OperationalError
@@ -10,9 +14,71 @@ from dotenv import load_dotenv
 
 # Load environment variables to get connection strings
 load_dotenv()
+
+# Prime psutil's internal CPU timestamp so later interval=None reads return
+# the average since the previous call instead of a meaningless 0.0.
+psutil.cpu_percent(interval=None)
+
 DATABASE_URL = os.getenv("DATABASE_URL")
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
 
+# Persistent clients for the health probes. Building a Redis client or a
+# SQLAlchemy engine per call pays socket/pool construction (and a TCP
+# handshake) on every dashboard render; with these singletons each probe is
+# just a ping()/SELECT 1 on an already-open pooled connection.
+_REDIS = (
+    Redis.from_url(
+        CELERY_BROKER_URL,
+        socket_connect_timeout=2,
+        socket_timeout=2,
+        health_check_interval=30,
+    )
+    if CELERY_BROKER_URL else None
+)
+_ENGINE = (
+    create_engine(
+        DATABASE_URL,
+        pool_size=2,
+        max_overflow=0,
+        pool_pre_ping=True,
+        connect_args={"connect_timeout": 5},
+    )
+    if DATABASE_URL else None
+)
+# Shared inspector: worker fanout is in-cluster, so a sub-second broadcast
+# timeout is plenty and constructing the inspector per call buys nothing.
+_INSPECTOR = celery.control.inspect(timeout=0.75)
+
+
+def ttl_cache(seconds: int):
+    """
+    Memoizes a zero-argument health probe for a short window. The Admin
+    Dashboard invokes several probes more than once per render (and again on
+    every Streamlit rerun); a few seconds of caching collapses those repeats
+    into a single DB/Redis/broker round-trip. Pass force_refresh=True to
+    bypass the cache (wired to the "Refresh Stats" button).
+    """
+    def decorator(fn):
+        lock = threading.Lock()
+        state = {}
+
+        @functools.wraps(fn)
+        def wrapper(*args, force_refresh=False, **kwargs):
+            if not force_refresh:
+                with lock:
+                    if state and time.monotonic() - state['at'] < seconds:
+                        return state['value']
+            value = fn(*args, **kwargs)
+            with lock:
+                state['at'] = time.monotonic()
+                state['value'] = value
+            return value
+
+        return wrapper
+    return decorator
+
+
+@ttl_cache(seconds=5)
 def get_celery_stats():
     """
     A simplified and more robust function to get Celery stats.
@@ -24,9 +90,28 @@ def get_celery_stats():
         return {"status": "Error", "message": "Broker connection is down."}
 
     try:
-        inspector = celery.control.inspect(timeout=2.0)
-        stats = inspector.stats()
-        
+        # ping() is the cheapest broadcast; if nobody answers there is no
+        # point paying for the heavier stats()/active() round-trips.
+        if not _INSPECTOR.ping():
+            return {
+                "status": "Idle / Unresponsive",
+                "message": "No workers responded to ping. They may be busy or offline.",
+                "active_workers": 0,
+                "total_tasks_processed": "N/A",
+                "tasks_in_progress": "N/A"
+            }
+
+        # stats() and active() each block on a broker RPC round-trip, so run
+        # them concurrently instead of paying both timeouts back to back.
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            stats_future = executor.submit(_INSPECTOR.stats)
+            active_future = executor.submit(_INSPECTOR.active)
+            stats = stats_future.result(timeout=6)
+            try:
+                active = active_future.result(timeout=6)
+            except Exception:
+                active = None
+
         if not stats:
             # If no stats are returned, it means workers are offline or too busy to respond.
             return {
@@ -45,7 +130,6 @@ def get_celery_stats():
                 total_processed += worker_stats.get('total', 0)
 
         tasks_in_progress = 0
-        active = inspector.active()
         if active:
             for worker_tasks in active.values():
                 if isinstance(worker_tasks, list):
@@ -65,31 +149,32 @@ def get_celery_stats():
         return {"status": "Error", "message": "Failed to inspect workers."}
 
 
+@ttl_cache(seconds=5)
 def get_redis_status():
     """
     Checks the Redis message broker connection and returns 'Online' or 'Offline'.
     """
-    if not CELERY_BROKER_URL:
+    if _REDIS is None:
         return "Not Configured"
     try:
-        # Use the same connection method as our other services for consistency
-        redis_client = Redis.from_url(CELERY_BROKER_URL, socket_connect_timeout=2)
-        return "Online" if redis_client.ping() else "Offline"
+        return "Online" if _REDIS.ping() else "Offline"
     except redis_exceptions.ConnectionError:
+        # Drop the stale sockets so the next probe reconnects cleanly.
+        _REDIS.connection_pool.disconnect()
         return "Offline"
     except Exception as e:
         print(f"HEALTH: An unexpected Redis error occurred: {e}")
         return "Error"
 
+@ttl_cache(seconds=5)
 def get_db_status():
     """
     Checks the PostgreSQL database connection and returns 'Online' or 'Offline'.
     """
-    if not DATABASE_URL:
+    if _ENGINE is None:
         return "Not Configured"
     try:
-        engine = create_engine(DATABASE_URL, connect_args={"connect_timeout": 5})
-        with engine.connect() as connection:
+        with _ENGINE.connect() as connection:
             # Execute a simple, fast query to verify connection.
             result = connection.execute(text("SELECT 1"))
             return "Online" if result.scalar() == 1 else "Offline"
@@ -100,22 +185,7 @@ def get_db_status():
         print(f"HEALTH: An unexpected DB error occurred: {e}")
         return "Error"
 
-def get_redis_status():
-    """
-    Checks the Redis message broker connection and returns 'Online' or 'Offline'.
-    """
-    if not CELERY_BROKER_URL:
-        return "Not Configured"
-    try:
-        redis_client = Redis.from_url(CELERY_BROKER_URL, socket_connect_timeout=5)
-        return "Online" if redis_client.ping() else "Offline"
-    except redis_exceptions.ConnectionError as e:
-        print(f"HEALTH: Redis connection failed: {e}")
-        return "Offline"
-    except Exception as e:
-        print(f"HEALTH: An unexpected Redis error occurred: {e}")
-        return "Error"
-
+@ttl_cache(seconds=5)
 def get_system_usage():
     """
     Gets CPU and Memory usage of the host system where this script is running.
@@ -125,9 +195,10 @@ def get_system_usage():
     Returns: A dictionary with CPU and memory percentages.
     """
     try:
-        # psutil.cpu_percent(interval=1) gets a non-blocking comparison over 1 second.
+        # interval=None returns the average since the previous call without
+        # blocking; the module-level priming call above anchors the first read.
         return {
-            "cpu_percent": psutil.cpu_percent(interval=1),
+            "cpu_percent": psutil.cpu_percent(interval=None),
             "memory_percent": psutil.virtual_memory().percent
         }
     except Exception as e:
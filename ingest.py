@@ -1,6 +1,8 @@
 # ingest.py
 
 import arxiv
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from functools import lru_cache
 from database import SessionLocal, Source
 # Import our new parsers map and the healer task
 from parsers import PARSER_MAP
@@ -9,25 +11,45 @@ import os
 
 from sourcerer import attempt_heal_parser
 
-redis_client = Redis.from_url(os.getenv('CELERY_BROKER_URL'), decode_responses=True)
+redis_client = Redis.from_url(
+    os.getenv('CELERY_BROKER_URL'),
+    decode_responses=True,
+    socket_keepalive=True,
+)
+
+# Shared arxiv.Client: fetches full pages over a kept-alive connection with
+# built-in retries, instead of the deprecated Search.results() which opens a
+# fresh connection per paginated request.
+_ARXIV_CLIENT = arxiv.Client(page_size=100, delay_seconds=3, num_retries=3)
+# Translation table strips newlines from abstracts in one pass per string.
+_NEWLINE_TO_SPACE = str.maketrans({'\n': ' '})
+# Fixed at import time: the set of source types we can actually parse.
+_PARSEABLE_TYPES = frozenset(PARSER_MAP)
+_ARXIV_QUERY = "cat:cs.LG OR cat:cs.AI OR cat:cs.CL OR cat:cs.CV OR cat:cs.RO"
+
+@lru_cache(maxsize=4)
+def _arxiv_search(max_results: int):
+    """The Search object is immutable configuration; reuse it across cycles."""
+    return arxiv.Search(
+        query=_ARXIV_QUERY,
+        max_results=max_results,
+        sort_by=arxiv.SortCriterion.SubmittedDate
+    )
 
 def fetch_from_arxiv(max_results=100):
     """Fetches papers from arXiv using its dedicated Python library."""
     print("INGEST: Fetching from arXiv source...")
-    query = "cat:cs.LG OR cat:cs.AI OR cat:cs.CL OR cat:cs.CV OR cat:cs.RO"
     try:
-        search = arxiv.Search(
-            query=query,
-            max_results=max_results,
-            sort_by=arxiv.SortCriterion.SubmittedDate
-        )
-        papers = []
-        for result in search.results():
-            papers.append({
-                "entry_id": result.entry_id, "title": result.title, "abstract": result.summary.replace('\n', ' '),
+        search = _arxiv_search(max_results)
+        papers = [
+            {
+                "entry_id": result.entry_id, "title": result.title,
+                "abstract": result.summary.translate(_NEWLINE_TO_SPACE),
                 "authors": [author.name for author in result.authors], "published_date": result.published,
                 "url": result.pdf_url, "source": "arXiv"
-            })
+            }
+            for result in _ARXIV_CLIENT.results(search)
+        ]
         print(f"INGEST: Found {len(papers)} new papers from arXiv.")
         return papers
     except Exception as e:
@@ -39,51 +61,75 @@ def fetch_from_web_sources():
     Fetches from all active web sources and triggers the AI healer
     for sources that fail.
     """
-    db = SessionLocal()
-    try:
-        # Get all sources that are active and have a parser defined in our map
-        sources_to_scrape = db.query(Source).filter(
-            Source.is_active == True,
-            Source.source_type.in_(PARSER_MAP.keys())
-        ).all()
-    finally:
-        db.close()
-    # --------------------------------------------------
-        
-    all_items = []
+    # Get all sources that are active and have a parser defined in our map.
+    # Streamed in batches rather than materialized twice by the ORM.
+    with SessionLocal() as db:
+        sources_to_scrape = list(
+            db.query(Source).filter(
+                Source.is_active == True,
+                Source.source_type.in_(_PARSEABLE_TYPES)
+            ).execution_options(stream_results=True).yield_per(50)
+        )
+
     print(f"INGEST: Found {len(sources_to_scrape)} active web sources to scrape.")
-    for source in sources_to_scrape:
-        print(f"--- Scraping source: {source.name} ---")
-        parser_func = PARSER_MAP.get(source.source_type)
-        if parser_func:
+    if not sources_to_scrape:
+        return []
+
+    all_items = []
+
+    # Each parser blocks on network I/O for hundreds of ms to seconds, so
+    # scraping serially costs the sum of all source latencies. Fan the
+    # sources out over a bounded thread pool and collect as they finish;
+    # the Redis failure tracking below uses atomic INCR, so concurrent
+    # completion handling stays safe.
+    executor = ThreadPoolExecutor(max_workers=min(16, len(sources_to_scrape)))
+    future_to_source = {
+        executor.submit(PARSER_MAP[source.source_type], source.url, source.name, 10): source
+        for source in sources_to_scrape
+    }
+    try:
+        # The deadline lives on as_completed: result(timeout=...) would be
+        # a no-op here because as_completed only yields futures that have
+        # already finished. Parsers carry their own HTTP timeouts (~20s),
+        # so this is the backstop for one that hangs anyway.
+        for future in as_completed(future_to_source, timeout=120):
+            source = future_to_source[future]
             # --- REDIS FAILURE TRACKING LOGIC ---
             failure_key = f"parser_failure:{source.id}"
-            
+
             try:
-                new_items = parser_func(source.url, source.name, 10)
+                new_items = future.result()
                 if not new_items:
                     raise ValueError("Parser returned an empty list.")
-                
+
                 print(f"-> Found {len(new_items)} items from {source.name}")
                 all_items.extend(new_items)
-                
+
                 # On success, delete the failure key from Redis
                 redis_client.delete(failure_key)
 
             except Exception as e:
                 print(f"INGEST: PARSE FAILED for source '{source.name}': {e}.")
-                
-                # On failure, increment the failure count in Redis
-                # INCR is atomic, so it's safe for multiple workers
-                failure_count = redis_client.incr(failure_key)
-                # Set an expiration so old failures don't count forever (e.g., 6 hours)
-                redis_client.expire(failure_key, 6 * 3600)
-                
+
+                # Increment the failure count and refresh its expiry (so old
+                # failures don't count forever) in one pipelined round-trip.
+                # INCR stays atomic, so it's safe for multiple workers.
+                with redis_client.pipeline(transaction=False) as pipe:
+                    pipe.incr(failure_key)
+                    pipe.expire(failure_key, 6 * 3600)
+                    failure_count, _ = pipe.execute()
+
                 # Trigger heal after 2 consecutive failures
                 if failure_count >= 2:
                     print(f"INGEST: Source '{source.name}' has failed {failure_count} times. Triggering AI Healer.")
                     attempt_heal_parser.delay(source.id)
                     # After triggering, delete the key to reset the process and prevent spam
                     redis_client.delete(failure_key)
-                continue
+    except TimeoutError:
+        hung = [s.name for f, s in future_to_source.items() if not f.done()]
+        print(f"INGEST: Deadline reached; abandoning unfinished sources: {', '.join(hung)}")
+    finally:
+        # Don't join hung worker threads on the way out; they exit on their
+        # own once their sockets time out.
+        executor.shutdown(wait=False, cancel_futures=True)
     return all_items
\ No newline at end of file
@@ -1,14 +1,16 @@
 # initial_setup.py
 
 import time
-from sqlalchemy.exc import OperationalError, IntegrityError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from database import create_all_tables, SessionLocal, Source
 from health import get_db_status
 
 def add_initial_sources(db_session):
     """
-    Adds a curated list of starting sources to the database.
-    Checks for existence before adding to be idempotent.
+    Adds a curated list of starting sources to the database in a single
+    INSERT ... ON CONFLICT DO NOTHING statement. Idempotency comes from the
+    unique constraints on name and url, so re-runs (and concurrent runs)
+    are safe without any per-row existence checks.
     """
     initial_sources = [
         # --- Pre-print Servers ---
@@ -29,41 +31,42 @@ def add_initial_sources(db_session):
     ]
 
     print("SETUP: Populating initial sources with comprehensive list...")
-    sources_added = 0
-    for src in initial_sources:
-        try:
-            # Check if a source with the same name or URL already exists
-            exists = db_session.query(Source).filter(
-                (Source.name == src['name']) | (Source.url == src['url'])
-            ).first()
-            
-            if not exists:
-                new_source = Source(**src)
-                db_session.add(new_source)
-                db_session.commit()
+    try:
+        # One round-trip and one commit for the whole list. DO NOTHING without
+        # a conflict target tolerates collisions on either unique column
+        # (name or url); RETURNING tells us which rows were actually new.
+        stmt = (
+            pg_insert(Source)
+            .values(initial_sources)
+            .on_conflict_do_nothing()
+            .returning(Source.name)
+        )
+        inserted_names = set(db_session.execute(stmt).scalars().all())
+        db_session.commit()
+        for src in initial_sources:
+            if src['name'] in inserted_names:
                 print(f"  -> Added source: {src['name']}")
-                sources_added += 1
             else:
                 print(f"  -> Skipping existing source: {src['name']}")
-        except IntegrityError:
-            # Handle rare race conditions if run in parallel
-            db_session.rollback()
-            print(f"  -> IntegrityError while adding {src['name']}, likely already exists.")
-        except Exception as e:
-            db_session.rollback()
-            print(f"  -> ERROR adding source {src['name']}: {e}")
-            
+        sources_added = len(inserted_names)
+    except Exception as e:
+        db_session.rollback()
+        print(f"  -> ERROR during bulk source insert: {e}")
+        sources_added = 0
+
     print(f"SETUP: Finished populating sources. Added {sources_added} new sources.")
 
 
 if __name__ == "__main__":
     print("--- Synthesis Engine Initial Setup ---")
     
-    # Wait for the database service to be ready
+    # Wait for the database service to be ready. get_db_status probes the
+    # shared pooled engine in health.py, so each retry is just a connect
+    # attempt, and exponential backoff (0.5 s -> 5 s cap) means a DB that
+    # comes up quickly is detected in about a second instead of five.
     max_retries = 10
-    retry_delay = 5
     for i in range(max_retries):
-        status = get_db_status()
+        status = get_db_status(force_refresh=True)
         print(f"Attempt {i+1}/{max_retries}: Checking database status... [{status}]")
         if status == "Online":
             print("SETUP: Database is online.")
@@ -71,7 +74,7 @@ if __name__ == "__main__":
         elif i == max_retries - 1:
             print("SETUP: FATAL - Database did not come online after multiple retries. Aborting.")
             exit(1)
-        time.sleep(retry_delay)
+        time.sleep(min(0.5 * 2 ** i, 5.0))
 
     # Step 1: Create all database tables defined in database.py
     try:
@@ -1,33 +1,66 @@
 # manage_sources.py
+from sqlalchemy import update
 from database import SessionLocal, Source
 
 def set_source_status(source_name, is_active: bool):
     db = SessionLocal()
     try:
-        source = db.query(Source).filter(Source.name == source_name).first()
-        if source:
-            source.is_active = is_active
+        # Single UPDATE ... RETURNING instead of a SELECT-then-UPDATE pair;
+        # an empty result means the source was not found.
+        result = db.execute(
+            update(Source)
+            .where(Source.name == source_name)
+            .values(is_active=is_active)
+            .returning(Source.id)
+        )
+        if result.first():
             db.commit()
             print(f"ACTION: Set source '{source_name}' active status to: {is_active}")
         else:
+            db.rollback()
             print(f"WARN: Source '{source_name}' not found in database.")
     finally:
         db.close()
 
+def set_sources_status(source_names, is_active: bool):
+    """Flips is_active for many sources in one UPDATE and one commit."""
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            update(Source)
+            .where(Source.name.in_(source_names))
+            .values(is_active=is_active)
+            .returning(Source.name)
+        )
+        updated = set(result.scalars().all())
+        db.commit()
+        for name in source_names:
+            if name in updated:
+                print(f"ACTION: Set source '{name}' active status to: {is_active}")
+            else:
+                print(f"WARN: Source '{name}' not found in database.")
+    finally:
+        db.close()
+
 if __name__ == "__main__":
     print("--- Source Management ---")
-    # Disable all known broken sources to create a stable baseline
-    set_source_status("Google AI Blog", False)
-    set_source_status("OpenAI Blog", False)
-    set_source_status("DeepMind Blog", False)
-    set_source_status("Meta AI Blog", False)
-    set_source_status("Hugging Face Blog", False)
-    set_source_status("NVIDIA AI Blog", False)
-    set_source_status("MIT Technology Review (AI)", False)
-    set_source_status("The Gradient", False)
-    
+    # Disable all known broken sources to create a stable baseline.
+    # One bulk UPDATE replaces eight SELECT+UPDATE+commit round-trips.
+    set_sources_status([
+        "Google AI Blog",
+        "OpenAI Blog",
+        "DeepMind Blog",
+        "Meta AI Blog",
+        "Hugging Face Blog",
+        "NVIDIA AI Blog",
+        "MIT Technology Review (AI)",
+        "The Gradient",
+    ], False)
+
     print("\n--- Current Status ---")
     db = SessionLocal()
-    for s in db.query(Source).all():
-        print(f"{'[ACTIVE]' if s.is_active else '[INACTIVE]'} {s.name}")
-    db.close()
\ No newline at end of file
+    try:
+        for s in db.query(Source).yield_per(100):
+            print(f"{'[ACTIVE]' if s.is_active else '[INACTIVE]'} {s.name}")
+    finally:
+        db.close()
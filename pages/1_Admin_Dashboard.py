@@ -1,16 +1,87 @@
 # pages/1_Admin_Dashboard.py
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 import pandas as pd
+from sqlalchemy import delete
 from database import (SessionLocal, CorrectionFlag, ProgressItem, ParserProposal, Source,
-                     get_all_sources, add_new_source, update_source, delete_source)
+                     get_all_sources, add_new_source)
 from health import get_celery_stats, get_db_status, get_redis_status, get_system_usage
+from sqlalchemy.orm import joinedload
 from sourcerer import apply_parser_fix
 from parsers import PARSER_MAP
-from dotenv import load_dotenv
 
-load_dotenv()
+# No load_dotenv() here: importing health above already loads the .env file,
+# and re-parsing it from disk on every Streamlit rerun is wasted I/O.
+ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin")
+
+# Computed once per import instead of twice per rerender.
+_PARSER_OPTIONS = list(PARSER_MAP.keys()) + ['other', 'arxiv']
+
+
+@st.cache_data(ttl=10, show_spinner=False)
+def _cached_all_sources():
+    """Short-lived cache over the full sources SELECT; cleared on writes."""
+    return get_all_sources()
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _load_pending_flags():
+    """
+    Pending flags plus the flagged item's title, as plain tuples: caching ORM
+    objects across sessions is unsafe, and the UI only reads these fields.
+    Cleared whenever a flag is resolved or deleted.
+    """
+    with SessionLocal() as db:
+        rows = db.query(
+            CorrectionFlag.id, CorrectionFlag.reason, CorrectionFlag.user_comment,
+            CorrectionFlag.created_at, ProgressItem.title,
+        ).join(
+            ProgressItem, CorrectionFlag.item_id == ProgressItem.id
+        ).filter(CorrectionFlag.status == 'pending').order_by(CorrectionFlag.created_at.desc()).all()
+        return [tuple(row) for row in rows]
+
+
+@st.fragment
+def _render_flag(flag_id, reason, user_comment, created_at, title):
+    """
+    One flag card as a fragment: resolving or deleting reruns only this card,
+    not the whole page (health probes, other tabs, the flag query). The card
+    collapses to a short notice until the next full-page rerun drops it.
+    """
+    if st.session_state.get(f"flag_handled_{flag_id}"):
+        st.caption("Flag handled — it will disappear on the next refresh.")
+        return
+
+    with st.container(border=True):
+        st.subheader(f"Flag for: *{title}*")
+        st.write(f"**Reason:** {reason}")
+        if user_comment:
+            st.write(f"**User Comment:** {user_comment}")
+        st.caption(f"Flagged on: {created_at.strftime('%Y-%m-%d %H:%M')} UTC")
+
+        b_col1, b_col2 = st.columns(2)
+        with b_col1:
+            if st.button("Mark as Resolved", key=f"resolve_{flag_id}", use_container_width=True):
+                # Criteria-style DML: one UPDATE, no re-SELECT.
+                with SessionLocal() as flag_db:
+                    flag_db.query(CorrectionFlag).filter(CorrectionFlag.id == flag_id).update(
+                        {'status': 'resolved'}, synchronize_session=False)
+                    flag_db.commit()
+                _load_pending_flags.clear()
+                st.session_state[f"flag_handled_{flag_id}"] = True
+                st.rerun(scope="fragment")
+        with b_col2:
+            if st.button("Delete Flag", key=f"delete_{flag_id}", type="primary", use_container_width=True):
+                with SessionLocal() as flag_db:
+                    flag_db.query(CorrectionFlag).filter(CorrectionFlag.id == flag_id).delete(
+                        synchronize_session=False)
+                    flag_db.commit()
+                _load_pending_flags.clear()
+                st.session_state[f"flag_handled_{flag_id}"] = True
+                st.rerun(scope="fragment")
+
 
 # --- Page Configuration and Authentication ---
 st.set_page_config(page_title="System Dashboard", layout="wide", page_icon="⚙️")
@@ -18,7 +89,6 @@ st.title("⚙️ System Health & Governance")
 
 # Simple password protection for the admin page
 password = st.text_input("Enter Admin Password", type="password")
-ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin")
 
 if password != ADMIN_PASSWORD:
     st.error("Incorrect password. Access denied.")
@@ -33,17 +103,36 @@ tab1, tab2, tab3, tab4 = st.tabs(["📊 Health", "🚩 Flag Review", "🤖 Parse
 with tab1:
     st.header("Live System Status")
     
-    if st.button("Refresh Stats"):
-        st.rerun()
+    # A click already triggers a rerun; passing force_refresh through makes the
+    # probes bypass their short TTL cache instead of serving memoized results.
+    force_refresh = st.button("Refresh Stats")
+
+    # Each probe has a multi-second timeout, so running them serially makes the
+    # page load pay the sum. Run them concurrently and pay only the slowest one.
+    def _safe_result(future, fallback):
+        try:
+            return future.result(timeout=6)
+        except Exception as e:
+            print(f"DASHBOARD: Health probe failed: {e}")
+            return fallback
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        db_future = executor.submit(get_db_status, force_refresh=force_refresh)
+        redis_future = executor.submit(get_redis_status, force_refresh=force_refresh)
+        celery_future = executor.submit(get_celery_stats, force_refresh=force_refresh)
+        usage_future = executor.submit(get_system_usage, force_refresh=force_refresh)
+        db_status = _safe_result(db_future, "Error")
+        redis_status = _safe_result(redis_future, "Error")
+        celery_stats = _safe_result(celery_future, {"status": "Error", "message": "Probe timed out."})
+        usage = _safe_result(usage_future, {"cpu_percent": "N/A", "memory_percent": "N/A"})
 
     st.subheader("Core Infrastructure")
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("PostgreSQL DB", get_db_status())
+        st.metric("PostgreSQL DB", db_status)
     with col2:
-        st.metric("Redis Broker", get_redis_status())
+        st.metric("Redis Broker", redis_status)
     with col3:
-        celery_stats = get_celery_stats()
         st.metric("Celery System Status", celery_stats.get('status', 'Unknown'))
         st.caption(celery_stats.get('message', ''))
 
@@ -57,56 +146,34 @@ with tab1:
         st.metric("Total Tasks Processed", celery_stats.get('total_tasks_processed', 'N/A'))
     
     st.subheader("Host System Usage")
-    usage = get_system_usage()
     s1, s2 = st.columns(2)
     s1.metric("CPU Usage", f"{usage.get('cpu_percent', 0)}%")
     s2.metric("Memory Usage", f"{usage.get('memory_percent', 0)}%")
 
 
-# --- Flag Review Tab ---
-with tab2:
-    st.header("Content Governance: Pending Flags")
-    db = SessionLocal()
-    try:
-        # Query for pending flags and join with the related progress item to get its title
-        pending_flags = db.query(CorrectionFlag, ProgressItem).join(
-            ProgressItem, CorrectionFlag.item_id == ProgressItem.id
-        ).filter(CorrectionFlag.status == 'pending').order_by(CorrectionFlag.created_at.desc()).all()
+# One session serves tabs 2-4 for the whole render (including the button
+# handlers), instead of each tab checking its own connection out of the pool.
+with SessionLocal() as db:
+    # --- Flag Review Tab ---
+    with tab2:
+        st.header("Content Governance: Pending Flags")
+        pending_flags = _load_pending_flags()
 
         if not pending_flags:
             st.success("No pending flags to review. All content is clear!")
         else:
             st.info(f"You have {len(pending_flags)} items to review.")
-            for flag, item in pending_flags:
-                with st.container(border=True):
-                    st.subheader(f"Flag for: *{item.title}*")
-                    st.write(f"**Reason:** {flag.reason}")
-                    if flag.user_comment:
-                        st.write(f"**User Comment:** {flag.user_comment}")
-                    st.caption(f"Flagged on: {flag.created_at.strftime('%Y-%m-%d %H:%M')} UTC")
+            for flag_row in pending_flags:
+                _render_flag(*flag_row)
 
-                    b_col1, b_col2 = st.columns(2)
-                    with b_col1:
-                        if st.button("Mark as Resolved", key=f"resolve_{flag.id}", use_container_width=True):
-                            flag_to_update = db.query(CorrectionFlag).get(flag.id)
-                            flag_to_update.status = 'resolved'
-                            db.commit()
-                            st.rerun()
-                    with b_col2:
-                        if st.button("Delete Flag", key=f"delete_{flag.id}", type="primary", use_container_width=True):
-                            flag_to_delete = db.query(CorrectionFlag).get(flag.id)
-                            db.delete(flag_to_delete)
-                            db.commit()
-                            st.rerun()
-    finally:
-        db.close()
-
-# --- Parser Healing Tab ---
-with tab3:
-    st.header("AI-Generated Parser Fixes")
-    db = SessionLocal()
-    try:
-        pending_proposals = db.query(ParserProposal).join(Source).filter(
+    # --- Parser Healing Tab ---
+    with tab3:
+        st.header("AI-Generated Parser Fixes")
+        # joinedload materializes each proposal's Source in the same query,
+        # avoiding a per-row SELECT below (classic N+1).
+        pending_proposals = db.query(ParserProposal).options(
+            joinedload(ParserProposal.source)
+        ).filter(
             ParserProposal.status == 'pending_review'
         ).all()
 
@@ -115,14 +182,14 @@ with tab3:
         else:
             st.info(f"You have {len(pending_proposals)} parser fixes to review.")
             for proposal in pending_proposals:
-                source = db.query(Source).get(proposal.source_id)
+                source = proposal.source
                 with st.container(border=True):
                     st.subheader(f"Proposed Fix for: `{source.name}`")
                     st.caption(f"Proposed on: {proposal.created_at.strftime('%Y-%m-%d %H:%M')} UTC")
 
                     st.markdown("##### AI-Generated Python Code:")
                     st.code(proposal.proposed_code, language='python')
-                    
+
                     st.markdown("##### Validation Sample (what the new code found):")
                     st.json(proposal.validation_output_sample, expanded=False)
 
@@ -135,99 +202,116 @@ with tab3:
                             st.rerun()
                     with b_col2:
                         if st.button("❌ Reject Fix", key=f"reject_{proposal.id}", type="primary", use_container_width=True):
-                            proposal_to_update = db.query(ParserProposal).get(proposal.id)
-                            proposal_to_update.status = 'rejected'
+                            proposal.status = 'rejected'
                             db.commit()
                             st.rerun()
-    finally:
-        db.close()
-
-# --- Source Management Tab ---
-with tab4:
-    st.header("Manage Ingestion Sources")
-
-    # --- Section 1: Add a New Source (This form is already correct) ---
-    st.subheader("Add New Source")
-    with st.form("new_source_form", clear_on_submit=True):
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            new_name = st.text_input("Source Name", placeholder="e.g., My Favorite AI Blog")
-        with col2:
-            new_url = st.text_input("Source URL", placeholder="https://example.com/blog")
-        with col3:
-            parser_types = list(PARSER_MAP.keys()) + ['other', 'arxiv']
-            new_type = st.selectbox("Parser Type", options=parser_types, help="Select the parser that matches the site's layout.")
+
+    # --- Source Management Tab ---
+    with tab4:
+        st.header("Manage Ingestion Sources")
+
+        # --- Section 1: Add a New Source (This form is already correct) ---
+        st.subheader("Add New Source")
+        with st.form("new_source_form", clear_on_submit=True):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                new_name = st.text_input("Source Name", placeholder="e.g., My Favorite AI Blog")
+            with col2:
+                new_url = st.text_input("Source URL", placeholder="https://example.com/blog")
+            with col3:
+                new_type = st.selectbox("Parser Type", options=_PARSER_OPTIONS, help="Select the parser that matches the site's layout.")
         
-        add_button = st.form_submit_button("Add Source")
-        if add_button:
-            if new_name and new_url and new_type:
-                add_new_source(name=new_name, url=new_url, source_type=new_type)
-                st.success(f"Source '{new_name}' added successfully! It will be scraped on the next cycle.")
-                st.rerun()
-            else:
-                st.error("Please fill in all fields.")
-
-    st.divider()
-
-    # --- Section 2: Edit Existing Sources ---
-    st.subheader("Edit Existing Sources")
+            add_button = st.form_submit_button("Add Source")
+            if add_button:
+                if new_name and new_url and new_type:
+                    add_new_source(name=new_name, url=new_url, source_type=new_type)
+                    _cached_all_sources.clear()
+                    st.success(f"Source '{new_name}' added successfully! It will be scraped on the next cycle.")
+                    st.rerun()
+                else:
+                    st.error("Please fill in all fields.")
+
+        st.divider()
+
+        # --- Section 2: Edit Existing Sources ---
+        st.subheader("Edit Existing Sources")
     
-    sources_data = get_all_sources()
-    if not sources_data:
-        st.info("No sources found in the database. Add one using the form above.")
-    else:
-        # --- NEW: Wrap the editor and save button in a form ---
-        with st.form("edit_sources_form"):
-            source_list = [
-                {"ID": s.id, "Name": s.name, "URL": s.url, "Parser Type": s.source_type, "Is Active": s.is_active}
-                for s in sources_data
-            ]
-            df_sources = pd.DataFrame(source_list)
+        sources_data = _cached_all_sources()
+        if not sources_data:
+            st.info("No sources found in the database. Add one using the form above.")
+        else:
+            # --- NEW: Wrap the editor and save button in a form ---
+            with st.form("edit_sources_form"):
+                # Tuples + explicit columns skip per-row dict hashing and keep
+                # column dtypes stable instead of falling back to object
+                # inference.
+                df_sources = pd.DataFrame.from_records(
+                    [(s.id, s.name, s.url, s.source_type, s.is_active) for s in sources_data],
+                    columns=["ID", "Name", "URL", "Parser Type", "Is Active"],
+                )
             
-            # The data editor itself goes inside the form
-            edited_df = st.data_editor(
-                df_sources,
-                column_config={
-                    "ID": st.column_config.NumberColumn("ID", disabled=True),
-                    "Is Active": st.column_config.CheckboxColumn("Active?", default=True),
-                    "Parser Type": st.column_config.SelectboxColumn("Parser", options=list(PARSER_MAP.keys()) + ['other', 'arxiv']),
-                },
-                use_container_width=True,
-                hide_index=True,
-                num_rows="dynamic",
-                key="source_editor"
-            )
+                # The data editor itself goes inside the form
+                st.data_editor(
+                    df_sources,
+                    column_config={
+                        "ID": st.column_config.NumberColumn("ID", disabled=True),
+                        "Is Active": st.column_config.CheckboxColumn("Active?", default=True),
+                        "Parser Type": st.column_config.SelectboxColumn("Parser", options=_PARSER_OPTIONS),
+                    },
+                    use_container_width=True,
+                    hide_index=True,
+                    num_rows="dynamic",
+                    key="source_editor"
+                )
             
-            # The crucial submit button for this form
-            save_button = st.form_submit_button("Save Changes to All Sources")
-
-            if save_button:
-                # This logic now only runs when the form is submitted
-                original_data_map = {item["ID"]: item for item in source_list}
-                edited_data_map = {item["ID"]: item for item in edited_df.to_dict('records')}
-                
-                changes_made = False
-                
-                # Check for updated or modified rows
-                for source_id, edited_row in edited_data_map.items():
-                    if source_id not in original_data_map or original_data_map[source_id] != edited_row:
-                        changes_made = True
-                        update_data = {
-                            'name': edited_row['Name'],
-                            'url': edited_row['URL'],
-                            'source_type': edited_row['Parser Type'],
-                            'is_active': edited_row['Is Active']
-                        }
-                        update_source(source_id, update_data)
-
-                # Check for deleted rows
-                for source_id in original_data_map:
-                    if source_id not in edited_data_map:
-                        changes_made = True
-                        delete_source(source_id)
-                
-                if changes_made:
-                    st.success("All changes saved successfully!")
-                    st.rerun()
-                else:
-                    st.info("No changes were detected to save.")
+                # The crucial submit button for this form
+                save_button = st.form_submit_button("Save Changes to All Sources")
+
+                if save_button:
+                    # The data editor already tracks its own edit delta in session
+                    # state, so there is no need to diff full before/after copies
+                    # of the table — translate the delta straight into one bulk
+                    # UPDATE, one bulk INSERT and one DELETE.
+                    column_to_field = {
+                        "Name": "name",
+                        "URL": "url",
+                        "Parser Type": "source_type",
+                        "Is Active": "is_active",
+                    }
+                    delta = st.session_state.get("source_editor", {})
+                    edited_rows = delta.get("edited_rows", {})
+                    added_rows = delta.get("added_rows", [])
+                    deleted_rows = delta.get("deleted_rows", [])
+
+                    if not (edited_rows or added_rows or deleted_rows):
+                        st.info("No changes were detected to save.")
+                    else:
+                        try:
+                            if edited_rows:
+                                updates = []
+                                for row_pos, edits in edited_rows.items():
+                                    update_map = {"id": int(df_sources.iloc[int(row_pos)]["ID"])}
+                                    update_map.update({
+                                        column_to_field[col]: value
+                                        for col, value in edits.items() if col in column_to_field
+                                    })
+                                    updates.append(update_map)
+                                db.bulk_update_mappings(Source, updates)
+                            if added_rows:
+                                inserts = [
+                                    {column_to_field[col]: value for col, value in row.items() if col in column_to_field}
+                                    for row in added_rows
+                                ]
+                                inserts = [row for row in inserts if row.get("name") and row.get("url")]
+                                if inserts:
+                                    db.bulk_insert_mappings(Source, inserts)
+                            if deleted_rows:
+                                deleted_ids = [int(df_sources.iloc[int(pos)]["ID"]) for pos in deleted_rows]
+                                db.execute(delete(Source).where(Source.id.in_(deleted_ids)))
+                            db.commit()
+                            _cached_all_sources.clear()
+                            st.success("All changes saved successfully!")
+                            st.rerun()
+                        except Exception as e:
+                            db.rollback()
+                            st.error(f"Failed to save changes: {e}")
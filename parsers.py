@@ -1,71 +1,172 @@
 # parsers.py
 
+import os
 import requests
+from requests.adapters import HTTPAdapter, Retry
 from bs4 import BeautifulSoup
 from datetime import datetime
 import json
-import re
+from functools import lru_cache
 from urllib.parse import urljoin
+from redis import Redis
 
 # --- Standard Request Headers to mimic a browser ---
+# Single UA constant shared by every parser; the per-parser header dicts that
+# used to pin three slightly different Chrome versions are gone, and requests
+# merges these session defaults into every fetch for free.
+_UA_DESKTOP = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36'
 HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/107.0.0.0 Safari/537.36',
+    'User-Agent': _UA_DESKTOP,
     'Accept-Language': 'en-US,en;q=0.9',
     'Accept-Encoding': 'gzip, deflate, br',
     'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
     'Connection': 'keep-alive',
 }
 
+# Extra fields OpenAI's CDN wants before it will serve the page (403 without
+# them); built once instead of per call.
+_OPENAI_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Sec-Fetch-User': '?1',
+}
+
+# --- Shared HTTP session ---
+# One pooled Session for all parsers: keepalive connections and TLS session
+# reuse mean the second and later polls of the same host skip DNS, TCP and
+# TLS handshakes entirely, and transient 5xx/429s get a short retry.
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+_adapter = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+)
+SESSION.mount('https://', _adapter)
+SESSION.mount('http://', _adapter)
+
+# --- Conditional-GET cache ---
+# Blog index pages change at most a few times a day, yet we poll them every
+# cycle. Remembering each page's ETag/Last-Modified validators in Redis lets
+# the server answer unchanged polls with a bodyless 304, in which case we
+# reuse the cached bytes instead of re-downloading 50-200 KB of HTML.
+_HTTP_CACHE_TTL = 6 * 3600
+_redis_cache = None
+if os.getenv('CELERY_BROKER_URL'):
+    try:
+        _redis_cache = Redis.from_url(os.getenv('CELERY_BROKER_URL'), socket_connect_timeout=2)
+    except Exception as e:
+        print(f"PARSER: Redis HTTP cache unavailable: {e}")
+
+def fetch_html(url, headers=None, timeout=20):
+    """
+    Fetches a URL through the shared session with conditional-GET support.
+    Returns the page bytes; raises requests.RequestException on failure.
+    Degrades to a plain GET whenever Redis is unreachable.
+    """
+    meta_key = f"http_cache:meta:{url}"
+    body_key = f"http_cache:body:{url}"
+    req_headers = dict(headers) if headers else {}
+    if _redis_cache is not None:
+        try:
+            meta = _redis_cache.hgetall(meta_key)
+            if meta.get(b'etag'):
+                req_headers['If-None-Match'] = meta[b'etag'].decode()
+            if meta.get(b'last_modified'):
+                req_headers['If-Modified-Since'] = meta[b'last_modified'].decode()
+        except Exception:
+            pass
+
+    response = SESSION.get(url, headers=req_headers, timeout=timeout)
+    if response.status_code == 304 and _redis_cache is not None:
+        try:
+            cached_body = _redis_cache.get(body_key)
+            if cached_body is not None:
+                return cached_body
+        except Exception:
+            pass
+        # Validators said "unchanged" but the body fell out of the cache;
+        # refetch without validators.
+        response = SESSION.get(url, headers=headers, timeout=timeout)
+
+    response.raise_for_status()
+    content = response.content
+    if _redis_cache is not None:
+        validators = {
+            field: value for field, value in
+            (('etag', response.headers.get('ETag')),
+             ('last_modified', response.headers.get('Last-Modified')))
+            if value
+        }
+        if validators:
+            try:
+                with _redis_cache.pipeline(transaction=False) as pipe:
+                    pipe.delete(meta_key)
+                    pipe.hset(meta_key, mapping=validators)
+                    pipe.expire(meta_key, _HTTP_CACHE_TTL)
+                    pipe.set(body_key, content, ex=_HTTP_CACHE_TTL)
+                    pipe.execute()
+            except Exception:
+                pass
+    return content
+
 # --- Helper Function for Making Requests ---
 def get_soup(url):
     """Fetches a URL and returns a BeautifulSoup object, or None on failure."""
     try:
-        response = requests.get(url, headers=HEADERS, timeout=20)
-        response.raise_for_status()  # Will raise an HTTPError for bad responses (4xx or 5xx)
-        return BeautifulSoup(response.text, 'html.parser')
+        content = fetch_html(url, timeout=20)
+        # lxml parses in C, several times faster than html.parser; passing the
+        # raw bytes lets it handle encoding detection in C as well.
+        return BeautifulSoup(content, 'lxml')
     except requests.RequestException as e:
         print(f"PARSER: Request failed for {url}: {e}")
         return None
 
+@lru_cache(maxsize=2048)
+def _abs(base: str, href: str) -> str:
+    """
+    urljoin re-parses both URLs on every call, and the same (base, href)
+    pairs recur across polling cycles, so the joins are worth caching.
+    """
+    return urljoin(base, href)
+
+def _slug(url_path: str) -> str:
+    """Last path segment of a URL; rsplit avoids building the full list."""
+    return url_path.rstrip('/').rsplit('/', 1)[-1]
+
 # --- Individual Parsers ---
 # NOTE: These selectors are based on website structures as of mid-2024.
 # They are the most brittle part of the application and will require periodic maintenance.
-
 def parse_google_blog(url: str, source_name: str, max_results=8) -> list:
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
+        content = fetch_html(url, timeout=10)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching URL {url}: {e}")
         return []
 
-    soup = BeautifulSoup(response.content, 'html.parser')
+    soup = BeautifulSoup(content, 'lxml')
     results = []
     
-    # The main repeating container for each article is a list item within a specific UL
-    articles = soup.select('ul.gdm-pagination__list li.glue-grid__col')
+    # Select the card anchors in one pass instead of finding the list items
+    # first and re-walking each one for its 'a.glue-card'.
+    cards = soup.select('ul.gdm-pagination__list li.glue-grid__col a.glue-card')
 
-    for article in articles[:max_results]:
+    for card in cards[:max_results]:
         try:
-            card = article.find('a', class_='glue-card')
-            if not card:
-                continue
-
             # 1. Get the full URL to the article
             post_url = card.get('href')
             if not post_url:
                 continue
             
             # Ensure the URL is absolute
-            post_url = urljoin(url, post_url)
+            post_url = _abs(url, post_url)
 
             # 2. Get the entry_id from the URL slug
-            entry_id = post_url.strip('/').split('/')[-1]
+            entry_id = _slug(post_url)
 
             # 3. Get the title of the article
             title_tag = card.find('p', class_='glue-headline--headline-5')
@@ -80,9 +181,10 @@ def parse_google_blog(url: str, source_name: str, max_results=8) -> list:
             published_date_str = date_tag['datetime'] if date_tag and date_tag.has_attr('datetime') else None
             
             if published_date_str:
-                # Parse date and format to ISO 8601 with UTC timezone
-                dt_obj = datetime.strptime(published_date_str, '%Y-%m-%d')
-                published_date = dt_obj.strftime('%Y-%m-%dT00:00:00Z')
+                # Validate and format to ISO 8601 with UTC timezone;
+                # fromisoformat parses in C, unlike strptime.
+                dt_obj = datetime.fromisoformat(published_date_str)
+                published_date = f"{dt_obj:%Y-%m-%d}T00:00:00Z"
             else:
                 published_date = None
             
@@ -107,44 +209,28 @@ def parse_google_blog(url: str, source_name: str, max_results=8) -> list:
 
 def parse_openai_blog(url: str, source_name: str, max_results=8) -> list:
 
-    # Enhanced headers to mimic a real browser and avoid 403 Forbidden errors.
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-        'Accept-Language': 'en-US,en;q=0.9',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-        'Sec-Fetch-Dest': 'document',
-        'Sec-Fetch-Mode': 'navigate',
-        'Sec-Fetch-Site': 'none',
-        'Sec-Fetch-User': '?1',
-    }
-    
     try:
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
+        content = fetch_html(url, headers=_OPENAI_HEADERS, timeout=15)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching URL {url}: {e}")
         return []
 
-    soup = BeautifulSoup(response.content, 'html.parser')
+    soup = BeautifulSoup(content, 'lxml')
     results = []
     
-    # Articles are within 'li' tags, which contain an 'a' tag.
-    posts = soup.select('#content ul > li a[href]')
+    # Articles are within 'li' tags, which contain an 'a' tag. The href
+    # prefix filter runs inside the selector rather than per link in Python.
+    posts = soup.select('#content ul > li a[href^="/research/"]')
 
     for post in posts[:max_results]:
         try:
             # 1. Get the full URL to the article
             href = post.get('href')
-            if not href or not href.startswith('/research/'):
-                continue
-            
-            post_url = urljoin(response.url, href)
+
+            post_url = _abs(url, href)
 
             # 2. Use the URL slug as a unique entry_id
-            entry_id = href.strip('/').split('/')[-1]
+            entry_id = _slug(href)
 
             # 3. Get the title of the article
             title_tag = post.find('h3')
@@ -160,8 +246,8 @@ def parse_openai_blog(url: str, source_name: str, max_results=8) -> list:
             if date_tag and date_tag.has_attr('data-date'):
                 published_date_str = date_tag['data-date']
                 try:
-                    dt_obj = datetime.strptime(published_date_str, '%Y-%m-%d')
-                    published_date = dt_obj.strftime('%Y-%m-%dT00:00:00Z')
+                    dt_obj = datetime.fromisoformat(published_date_str)
+                    published_date = f"{dt_obj:%Y-%m-%d}T00:00:00Z"
                 except ValueError as ve:
                     print(f"Date format error for {published_date_str}: {ve}")
 
@@ -197,10 +283,12 @@ def parse_meta_blog(url: str, source_name: str, max_results=8):
             link_tag = article.find('a', href=True)
             if not link_tag: continue
             
-            post_url = urljoin(url, link_tag['href'])
+            post_url = _abs(url, link_tag['href'])
             title = link_tag.text.strip()
             # The abstract is often in a sibling or child element, this is a bit fragile
-            abstract_tag = article.find('div', class_=lambda c: c and 'description' in c)
+            # Attribute-substring selector instead of a per-element Python
+            # callable walking the subtree.
+            abstract_tag = article.select_one('div[class*="description"]')
             abstract = abstract_tag.text.strip() if abstract_tag else f"A new post titled '{title}' from Meta AI."
 
             posts.append({
@@ -213,22 +301,72 @@ def parse_meta_blog(url: str, source_name: str, max_results=8):
             continue
     return posts
 
-def parse_huggingface_blog(url: str, source_name: str, max_results=8) -> list:
+def _hf_post_from_blog_data(blog_data: dict, base_url: str, source_name: str):
+    """
+    Maps one Hugging Face blog record to our item dict. The same shape comes
+    back from the /api/blog endpoint and from the data-props JSON the HTML
+    listing embeds, so both paths share this. Returns None if unusable.
+    """
+    slug = blog_data.get('slug')
+    if not slug:
+        return None
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    published_date = None
+    published_date_str = blog_data.get('publishedAt')
+    if published_date_str:
+        # ISO 8601, with or without milliseconds ("2025-06-16T00:00:00.000Z").
+        # fromisoformat handles both in C once the trailing Z is normalized.
+        try:
+            dt_obj = datetime.fromisoformat(published_date_str.replace('Z', '+00:00'))
+            published_date = f"{dt_obj:%Y-%m-%dT%H:%M:%S}Z"
+        except ValueError:
+            pass
+
+    authors_list = blog_data.get('authors', [])
+    authors = [author.get('user') for author in authors_list
+               if isinstance(author, dict) and author.get('user')]
+
+    return {
+        "entry_id": slug,
+        "title": blog_data.get('title', 'No title available'),
+        "abstract": "",  # No abstract available on the blog listing page
+        "authors": authors,
+        "published_date": published_date,
+        "url": _abs(base_url, f"blog/{slug}"),
+        "source": source_name,
     }
-    
+
+def parse_huggingface_blog(url: str, source_name: str, max_results=8) -> list:
+
+    # JSON-first: everything the HTML listing embeds in data-props is served
+    # directly by the blog API, so a successful API hit skips downloading
+    # and DOM-parsing the full page entirely.
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
+        response = SESSION.get(_abs(url, '/api/blog'), params={'limit': max_results}, timeout=10)
+        if response.status_code == 200:
+            payload = response.json()
+            entries = payload.get('blogs', payload) if isinstance(payload, dict) else payload
+            if isinstance(entries, list):
+                results = []
+                for entry in entries[:max_results]:
+                    if isinstance(entry, dict):
+                        post = _hf_post_from_blog_data(entry.get('blog', entry), url, source_name)
+                        if post:
+                            results.append(post)
+                if results:
+                    return results
+    except (requests.RequestException, ValueError) as e:
+        print(f"PARSER: Hugging Face API fetch failed, falling back to HTML: {e}")
+
+    try:
+        content = fetch_html(url, timeout=10)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching URL {url}: {e}")
         return []
 
-    soup = BeautifulSoup(response.text, 'html.parser')
+    soup = BeautifulSoup(content, 'lxml')
     results = []
-    
+
     # Articles are contained within divs with a 'data-target' attribute.
     # The data is conveniently stored in a 'data-props' JSON string.
     article_divs = soup.select('div[data-target="BlogThumbnail"]')
@@ -241,48 +379,17 @@ def parse_huggingface_blog(url: str, source_name: str, max_results=8) -> list:
 
             data = json.loads(props_str)
             blog_data = data.get('blog')
-
             if not blog_data:
                 continue
-            
-            slug = blog_data.get('slug')
-            if not slug:
-                continue
-                
-            post_url = urljoin(url, f"blog/{slug}")
-            entry_id = slug
 
-            title = blog_data.get('title', 'No title available')
-            
-            authors_list = blog_data.get('authors', [])
-            authors = [author.get('user') for author in authors_list if author.get('user')]
-            
-            published_date_str = blog_data.get('publishedAt')
-            
-            # Ensure the date is valid and format it consistently
-            if published_date_str:
-                # The date is already in ISO 8601 format, e.g., "2025-06-16T00:00:00.000Z"
-                # We can parse it to validate and then reformat, or use as is.
-                # Let's parse and reformat to ensure consistency without milliseconds.
-                dt_obj = datetime.strptime(published_date_str, "%Y-%m-%dT%H:%M:%S.%fZ")
-                published_date = dt_obj.strftime("%Y-%m-%dT%H:%M:%SZ")
-            else:
-                published_date = None
-            
-            results.append({
-                "entry_id": entry_id,
-                "title": title,
-                "abstract": "",  # No abstract available on the blog listing page
-                "authors": authors,
-                "published_date": published_date,
-                "url": post_url,
-                "source": source_name,
-            })
+            post = _hf_post_from_blog_data(blog_data, url, source_name)
+            if post:
+                results.append(post)
 
         except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
             print(f"Skipping a post due to parsing error: {e}")
             continue
-            
+
     return results
 
 def parse_microsoft_blog(url: str, source_name: str, max_results=8):
@@ -317,14 +424,14 @@ def parse_techreview_ai(url: str, source_name: str, max_results=8):
     soup = get_soup(url)
     if not soup: return []
 
-    articles = soup.find_all('div', class_=re.compile(r'promo-container'), limit=max_results)
+    articles = soup.select('div[class*="promo-container"]', limit=max_results)
     posts = []
     for article in articles:
         try:
             link_tag = article.find('a', href=True)
             if not link_tag: continue
             
-            post_url = urljoin(url, link_tag['href'])
+            post_url = _abs(url, link_tag['href'])
             title_tag = article.find(['h2', 'h3'])
             title = title_tag.text.strip() if title_tag else "Untitled"
             
@@ -353,7 +460,7 @@ def parse_gradient_pub(url: str, source_name: str, max_results=8):
             link_tag = article.find('a', class_='post-card-image-link', href=True)
             if not link_tag: continue
             
-            post_url = urljoin(url, link_tag['href'])
+            post_url = _abs(url, link_tag['href'])
             title_tag = article.find('h2', class_='post-card-title')
             title = title_tag.text.strip() if title_tag else "Untitled"
             
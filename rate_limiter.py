@@ -1,11 +1,39 @@
 # rate_limiter.py
 
 import time
+import uuid
 from redis import Redis
 import os
 
-# Connect to Redis using the same environment variable as Celery
-redis_client = Redis.from_url(os.getenv('CELERY_BROKER_URL'))
+# Connect to Redis using the same environment variable as Celery. The
+# explicit pool cap lets many worker threads share the client without
+# serializing on a single socket.
+redis_client = Redis.from_url(os.getenv('CELERY_BROKER_URL'), max_connections=64)
+
+# The whole check-and-insert runs server-side as one Lua script. The old
+# two-pipeline version had a race between "count the tokens" and "add a
+# token": concurrent workers could all observe count < limit and overshoot
+# the quota. Scripts execute atomically in Redis, so this closes that gap
+# and halves the round-trips per acquire() call.
+#
+# KEYS[1] = zset key, ARGV = [window_start, now, limit, period, member]
+# Returns {1} if a token was granted, or {0, oldest_score} when denied so
+# the caller can compute exactly how long until the next token frees up.
+# The member is a unique id rather than the timestamp itself: two workers
+# acquiring in the same microsecond would otherwise ZADD the same member
+# and one token would silently vanish from the count.
+_ACQUIRE_LUA = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, ARGV[1])
+local count = redis.call('ZCARD', KEYS[1])
+if count < tonumber(ARGV[3]) then
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[5])
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+    return {1}
+end
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+return {0, oldest[2]}
+"""
+_acquire_script = redis_client.register_script(_ACQUIRE_LUA)
 
 class RateLimiter:
     """
@@ -17,48 +45,48 @@ class RateLimiter:
         self.limit = limit
         self.period = period # in seconds
 
+    def _try_acquire(self):
+        """
+        Runs the atomic acquire script.
+
+        Returns:
+            (True, 0.0) if a token was acquired, or (False, wait_seconds)
+            where wait_seconds is the time until the oldest token leaves
+            the window and a retry can succeed.
+        """
+        now = time.time()
+        result = _acquire_script(
+            keys=[self.key],
+            args=[now - self.period, now, self.limit, self.period,
+                  f"{now}:{uuid.uuid4().hex}"],
+        )
+        if result[0]:
+            return True, 0.0
+        oldest = float(result[1])
+        return False, max(0.0, oldest + self.period - now)
+
     def acquire(self):
         """
         Attempts to acquire a token.
-        
+
         Returns:
             True if a token was acquired (action is allowed).
             False if the limit has been reached (action should be blocked).
         """
-        # Use a pipeline for atomic operations
-        p = redis_client.pipeline()
-        
-        # 1. Remove tokens that are older than our time window
-        # The score is the timestamp, so we remove all members with a score
-        # less than the start of the current time window.
-        now = time.time()
-        window_start = now - self.period
-        p.zremrangebyscore(self.key, 0, window_start)
-        
-        # 2. Get the current number of tokens in the set (within the window)
-        p.zcard(self.key)
-        
-        # Execute the pipeline and get the results
-        # result[1] will be the current count of tokens
-        results = p.execute()
-        current_count = results[1]
-        
-        # 3. Check if we are under the limit
-        if current_count < self.limit:
-            # If so, add a new token with the current timestamp as its score
-            p.zadd(self.key, {now: now})
-            # Set an expiration on the key itself as a fallback cleanup mechanism
-            p.expire(self.key, self.period)
-            p.execute()
-            return True
-        else:
-            # If we are at or over the limit, the action is denied
-            return False
+        return self._try_acquire()[0]
 
 def wait_for_token(limiter: RateLimiter):
     """
     A blocking function that waits until a token can be acquired from the limiter.
+    Sleeps exactly until the oldest token ages out of the window instead of
+    polling on a fixed interval.
     """
-    while not limiter.acquire():
-        print(f"RATE_LIMITER: Limit for '{limiter.key}' reached. Waiting 5 seconds...")
-        time.sleep(5)
\ No newline at end of file
+    while True:
+        granted, wait_seconds = limiter._try_acquire()
+        if granted:
+            return
+        # A small floor guards against busy-looping when the computed wait
+        # rounds to zero but the clock hasn't quite caught up.
+        wait_seconds = max(wait_seconds, 0.05)
+        print(f"RATE_LIMITER: Limit for '{limiter.key}' reached. Waiting {wait_seconds:.2f} seconds...")
+        time.sleep(wait_seconds)
@@ -36,6 +36,11 @@ model = genai.GenerativeModel(
     safety_settings=safety_settings
 )
 
+# Compiled once; clean_json_response runs per analyzed article, so there is
+# no point re-compiling these on every Gemini response.
+_JSON_BLOCK_RE = re.compile(r'\{.*\}', re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r',\s*([}\]])')
+
 # --- Prompts ---
 UNIFIED_PROMPT_TEMPLATE = """
 You are a world-class, multi-lingual AI research analyst. Your task is to perform a comprehensive analysis of the provided text and return a single, structured JSON object.
@@ -88,8 +93,17 @@ def clean_json_response(response_text):
     Cleans the Gemini response to extract a valid JSON object,
     even if it's embedded in markdown or has trailing commas.
     """
+    # Fast path: with response_mime_type set to application/json the model
+    # almost always returns a bare JSON object, so try decoding the whole
+    # response first. The DOTALL brace scan below is worst-case quadratic
+    # on large responses and should only run for malformed output.
+    try:
+        return json.loads(response_text)
+    except json.JSONDecodeError:
+        pass
+
     # Find the start and end of the JSON block using curly braces
-    json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+    json_match = _JSON_BLOCK_RE.search(response_text)
     if not json_match:
         print("SERVICES: ERROR - No JSON object found in the response.")
         return None
@@ -105,7 +119,7 @@ def clean_json_response(response_text):
         # This is a common issue with LLM-generated JSON
         try:
             # Remove trailing commas from objects and arrays
-            json_str_fixed = re.sub(r',\s*([}\]])', r'\1', json_str)
+            json_str_fixed = _TRAILING_COMMA_RE.sub(r'\1', json_str)
             return json.loads(json_str_fixed)
         except json.JSONDecodeError as e2:
             print(f"SERVICES: ERROR - Failed to decode JSON even after fixing trailing commas: {e2}")
@@ -1,44 +1,106 @@
 # sourcerer.py
 
 import os
+import ast
 import json
+import hashlib
+import inspect
 import traceback
 import time
-from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from datetime import datetime
+from urllib.parse import urlparse, urljoin
 
 import requests
 from bs4 import BeautifulSoup
+from lxml import html as lxml_html
+from redis import Redis
+from googlesearch import search
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 import google.generativeai as genai
 from celery_app import celery
 from database import SessionLocal, ParserProposal, Source
-from parsers import PARSER_MAP
+from parsers import PARSER_MAP, SESSION
 from dotenv import load_dotenv
 
-# --- NEW: Define the HEADERS here as well ---
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/107.0.0.0 Safari/537.36',
-    'Accept-Language': 'en-US,en;q=0.9',
-    'Accept-Encoding': 'gzip, deflate, br',
-    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
-    'Connection': 'keep-alive',
-}
-# ---------------------------------------------
-
 # --- Configuration ---
 load_dotenv()
 API_KEY = os.getenv("GOOGLE_API_KEY")
 if not API_KEY:
     # This service is non-essential, so we can disable it if the key is missing
     print("SOURCERER: WARNING - GOOGLE_API_KEY not found. Sourcerer tasks will be disabled.")
-    genai_model = None
-else:
+
+@lru_cache(maxsize=1)
+def _get_genai_model():
+    """
+    Builds the Gemini client on first use instead of at import, so workers
+    that never run a sourcerer task don't pay SDK init at boot. Returns
+    None when the API key is missing (tasks then no-op as before).
+    """
+    if not API_KEY:
+        return None
     genai.configure(api_key=API_KEY)
-    genai_model = genai.GenerativeModel(
+    return genai.GenerativeModel(
         model_name="gemini-2.5-flash",
         generation_config={"response_mime_type": "application/json"}
     )
 
+# --- Verdict cache ---
+# Google's result set overlaps heavily from cycle to cycle, and a URL's
+# verdict ("is this a quality AI blog?") barely changes, so verdicts are
+# kept in Redis for 30 days keyed on the normalized URL. Steady-state
+# cycles then skip the Gemini call for most candidates.
+_VERDICT_TTL = 30 * 24 * 3600
+_redis_verdicts = None
+if os.getenv('CELERY_BROKER_URL'):
+    try:
+        _redis_verdicts = Redis.from_url(os.getenv('CELERY_BROKER_URL'), socket_connect_timeout=2)
+    except Exception as e:
+        print(f"SOURCERER: Redis verdict cache unavailable: {e}")
+
+def _verdict_key(url: str) -> str:
+    parsed = urlparse(url)
+    normalized = parsed.netloc + parsed.path.rstrip('/')
+    return f"sourcerer:verdict:{hashlib.sha256(normalized.encode()).hexdigest()}"
+
+def _evaluate_url(url: str, rejected_domains: set):
+    """
+    Returns the Gemini verdict dict for one candidate URL, or None if the
+    URL was skipped (rejected domain) or could not be evaluated. Safe to
+    run from worker threads: the cache, the model client and set mutation
+    are all thread-safe, and rejected-domain races at worst cost one
+    redundant LLM call.
+    """
+    if urlparse(url).netloc in rejected_domains:
+        return None
+
+    result = None
+    if _redis_verdicts is not None:
+        try:
+            cached = _redis_verdicts.get(_verdict_key(url))
+            if cached is not None:
+                result = json.loads(cached)
+        except Exception:
+            pass
+
+    if result is None:
+        response = _get_genai_model().generate_content(SOURCERER_PROMPT.format(url=url))
+        result = json.loads(response.text.strip())
+        if _redis_verdicts is not None:
+            try:
+                _redis_verdicts.setex(_verdict_key(url), _VERDICT_TTL, json.dumps(result))
+            except Exception:
+                pass
+
+    if not result.get("is_high_quality_source"):
+        # One rejection is usually representative of the whole site; skip
+        # sibling URLs on the same domain for this cycle.
+        rejected_domains.add(urlparse(url).netloc)
+
+    return result
+
 # --- NEW, POWERFUL HEALER PROMPT ---
 HEALER_PROMPT_TEMPLATE = """
 You are an expert web scraping engineer specializing in Python and BeautifulSoup.
@@ -51,8 +113,8 @@ A parser for the source '{source_name}' at URL '{url}' has failed. I need you to
     - The full URL to the article.
     - The title of the article.
     - A brief abstract or summary.
-4.  Write a **complete, standalone Python function** with the exact signature: `def {function_name}(url: str, source_name: str, max_results=8) -> list:`.
-5.  The function must import `requests`, `BeautifulSoup`, `datetime`, and `urljoin` internally.
+4.  Write a **complete, standalone Python function** with the exact signature: `def {function_name}(url: str, source_name: str, max_results=8, _prefetched_html=None) -> list:`.
+5.  The function must import `requests`, `BeautifulSoup`, `datetime`, and `urljoin` internally, and construct the soup with the lxml backend: `BeautifulSoup(response.content, 'lxml')`. If `_prefetched_html` is not None, parse it directly instead of fetching the URL.
 6.  The function must return a list of dictionaries, each with keys: "entry_id", "title", "abstract", "authors", "published_date", "url", "source".
 7.  Handle potential errors gracefully with `try/except` blocks inside the loop for each article.
 8.  Your entire response must be ONLY the Python code for the function, enclosed in ```python ... ```. Do not add any other text, explanation, or introductions.
@@ -84,7 +146,7 @@ Analyze your previous code and the failure reason. Identify your mistake (e.g.,
 **Instructions:**
 1.  Do NOT simply repeat the old code. Propose a different strategy.
 2.  Look for alternative, more stable CSS classes or HTML tags.
-3.  Ensure the function has the exact signature: `def {function_name}(url: str, source_name: str, max_results=8) -> list:`.
+3.  Ensure the function has the exact signature: `def {function_name}(url: str, source_name: str, max_results=8, _prefetched_html=None) -> list:`, and use `_prefetched_html` instead of fetching when it is provided.
 4.  Your entire response must be ONLY the Python code for the function, enclosed in ```python ... ```.
 
 **Original HTML Content (for re-analysis):**
@@ -93,26 +155,59 @@ Analyze your previous code and the failure reason. Identify your mistake (e.g.,
 ---
 """
 
+# source_type -> parser function name, precomputed once. Both healer tasks
+# only ever need the name, and the old per-call loop over PARSER_MAP was a
+# roundabout spelling of this lookup.
+SOURCE_TYPE_TO_FUNCNAME = {t: f.__name__ for t, f in PARSER_MAP.items()}
+
+# Globals handed to AI-generated parser code during validation. Generated
+# functions import what they need themselves, but pre-binding the usual
+# suspects makes those imports cheap rebinds, and a dedicated namespace
+# keeps exec'd code from reading or clobbering this module's real globals.
+_HEALER_GLOBALS = {
+    'requests': requests,
+    'BeautifulSoup': BeautifulSoup,
+    'datetime': datetime,
+    'urljoin': urljoin,
+    'json': json,
+}
+
+def _prompt_html(html_content: str) -> str:
+    """
+    Condenses a page for the healer prompts. A blind html_content[:25000]
+    slice wasted most of the window on script/style payloads and could cut
+    off the article listing entirely; stripping the non-structural subtrees
+    first spends those 25k characters on markup the model can actually
+    write selectors against. Falls back to the raw slice if lxml chokes.
+    """
+    try:
+        doc = lxml_html.fromstring(html_content)
+        for tag in ('script', 'style', 'svg', 'noscript', 'iframe', 'link', 'meta', 'path'):
+            for el in list(doc.iter(tag)):
+                parent = el.getparent()
+                if parent is not None:
+                    parent.remove(el)
+        cleaned = lxml_html.tostring(doc, encoding='unicode')
+    except Exception:
+        cleaned = html_content
+    return cleaned[:25000]
+
 @celery.task(name="sourcerer.attempt_heal_parser", bind=True, max_retries=1)
 def attempt_heal_parser(self, source_id: int):
     """
     Iteratively attempts to fix a parser by providing feedback to the AI.
     """
+    genai_model = _get_genai_model()
     if not genai_model:
         return f"Healer skipped for source ID {source_id}: Gemini API not configured."
 
     db = SessionLocal()
-    source = db.query(Source).get(source_id)
+    source = db.get(Source, source_id)
     if not source:
         db.close()
         return f"Healer skipped: Source ID {source_id} not found."
     
-    func_name = None
-    for name, func in PARSER_MAP.items():
-        if name == source.source_type:
-            func_name = func.__name__
-            break
-            
+    func_name = SOURCE_TYPE_TO_FUNCNAME.get(source.source_type)
     if not func_name:
         db.close()
         return f"Healer skipped: No parser function found for source_type '{source.source_type}'."
@@ -120,7 +215,10 @@ def attempt_heal_parser(self, source_id: int):
     print(f"HEALER: Starting healing loop for '{source.name}' ({func_name})")
 
     try:
-        response = requests.get(source.url, headers=HEADERS, timeout=20)
+        # The shared pooled session from parsers.py: validation runs in the
+        # healing loop refetch the same host repeatedly, and keep-alive spares
+        # them the TCP+TLS handshake each time.
+        response = SESSION.get(source.url, timeout=20)
         response.raise_for_status()
         html_content = response.text
     except requests.RequestException as e:
@@ -130,6 +228,7 @@ def attempt_heal_parser(self, source_id: int):
     max_attempts = 5
     last_attempted_code = ""
     last_failure_reason = ""
+    prompt_html = _prompt_html(html_content)
 
     for attempt in range(1, max_attempts + 1):
         print(f"--- HEALER ATTEMPT #{attempt} for {source.name} ---")
@@ -137,13 +236,13 @@ def attempt_heal_parser(self, source_id: int):
         if attempt == 1:
             prompt = HEALER_PROMPT_TEMPLATE.format(
                 source_name=source.name, url=source.url, function_name=func_name,
-                html_content=html_content[:25000]
+                html_content=prompt_html
             )
         else:
             prompt = FEEDBACK_PROMPT_TEMPLATE.format(
                 source_name=source.name, url=source.url, function_name=func_name,
                 previous_code=last_attempted_code, failure_reason=last_failure_reason,
-                html_content=html_content[:25000]
+                html_content=prompt_html
             )
         
         try:
@@ -159,13 +258,24 @@ def attempt_heal_parser(self, source_id: int):
         print(f"HEALER: Validating AI-generated code (Attempt #{attempt})...")
         try:
             temp_namespace = {}
-            exec(ai_code, globals(), temp_namespace) # Pass globals() to provide access to imported modules
+            # Compile with a per-attempt filename so validation tracebacks
+            # (fed back to the model as failure_reason) point at the right
+            # generation, then exec against a copy of the prepared globals
+            # rather than this module's own namespace.
+            code_obj = compile(ai_code, f"<healer:{func_name}:attempt-{attempt}>", "exec")
+            exec(code_obj, dict(_HEALER_GLOBALS), temp_namespace)
             new_parser_func = temp_namespace.get(func_name)
 
             if not callable(new_parser_func):
                 raise ValueError("AI did not generate a callable function.")
-            
-            validation_results = new_parser_func(url=source.url, source_name=source.name)
+
+            # Hand the already-fetched page to the generated parser so the
+            # 5-attempt loop does not refetch the same URL per validation.
+            # Tolerate the model ignoring the optional parameter.
+            validation_kwargs = {'url': source.url, 'source_name': source.name}
+            if '_prefetched_html' in inspect.signature(new_parser_func).parameters:
+                validation_kwargs['_prefetched_html'] = html_content
+            validation_results = new_parser_func(**validation_kwargs)
             
             if not isinstance(validation_results, list):
                 raise TypeError("Generated function did not return a list.")
@@ -202,18 +312,13 @@ def apply_parser_fix(proposal_id: int):
     updates the parsers.py file.
     """
     db = SessionLocal()
-    proposal = db.query(ParserProposal).get(proposal_id)
+    proposal = db.get(ParserProposal, proposal_id)
     if not proposal or proposal.status != 'pending_review':
         db.close()
         return "Apply fix failed: Proposal not found or not pending."
 
-    source = db.query(Source).get(proposal.source_id)
-    func_name_to_replace = None
-    for name, func in PARSER_MAP.items():
-        if name == source.source_type:
-            func_name_to_replace = func.__name__
-            break
-            
+    source = db.get(Source, proposal.source_id)
+    func_name_to_replace = SOURCE_TYPE_TO_FUNCNAME.get(source.source_type)
     if not func_name_to_replace:
         db.close()
         return f"Apply fix failed: Could not find function for source_type '{source.source_type}'"
@@ -222,23 +327,22 @@ def apply_parser_fix(proposal_id: int):
 
     try:
         with open('parsers.py', 'r') as f:
-            lines = f.readlines()
-        
-        # Find the start and end of the function to replace
+            source_text = f.read()
+        lines = source_text.splitlines(keepends=True)
+
+        # Locate the exact line span of the function via the AST instead of
+        # scanning for "def " prefixes, which broke on decorators, nested
+        # defs and multi-line signatures. end_lineno covers the whole body.
         start_index, end_index = -1, -1
-        for i, line in enumerate(lines):
-            if line.strip().startswith(f"def {func_name_to_replace}("):
-                start_index = i
-            elif start_index != -1 and line.strip().startswith("def "):
-                end_index = i
+        for node in ast.parse(source_text).body:
+            if isinstance(node, ast.FunctionDef) and node.name == func_name_to_replace:
+                first_line = node.decorator_list[0].lineno if node.decorator_list else node.lineno
+                start_index = first_line - 1
+                end_index = node.end_lineno
                 break
-        
+
         if start_index == -1:
             raise FileNotFoundError(f"Could not find function {func_name_to_replace} to replace.")
-        
-        # If it's the last function in the file
-        if end_index == -1:
-            end_index = len(lines)
 
         # Reconstruct the file with the new code
         new_code_lines = proposal.proposed_code.split('\n')
@@ -249,7 +353,9 @@ def apply_parser_fix(proposal_id: int):
 
         with open('parsers.py', 'w') as f:
             f.writelines(final_lines)
-            
+            f.flush()
+            os.fsync(f.fileno())
+
         # Update the proposal status
         proposal.status = 'approved'
         db.commit()
@@ -293,7 +399,7 @@ def find_new_sources():
     """
     A Celery task that searches Google for new AI blogs and validates them with Gemini.
     """
-    if not genai_model:
+    if not _get_genai_model():
         return "Sourcerer task skipped: Gemini API key not configured."
 
     print("SOURCERER: Starting cycle to find new AI sources.")
@@ -314,42 +420,70 @@ def find_new_sources():
             print(f"SOURCERER: WARN - Google search failed for query '{query}': {e}")
             continue
 
+    if not potential_urls:
+        return "Sourcerer cycle complete. Google search returned no candidates."
+
     db = SessionLocal()
     try:
-        # Get all existing URLs to avoid re-processing
-        existing_urls = {s.url for s in db.query(Source.url).all()}
+        # Check only the ~30 candidate URLs against the sources table instead
+        # of materializing every stored URL; the unique index on url makes
+        # this one indexed lookup however large the table grows.
+        existing_urls = {
+            row[0] for row in
+            db.query(Source.url).filter(Source.url.in_(potential_urls)).all()
+        }
     finally:
         db.close()
     
-    new_sources_added = 0
-    for url in potential_urls:
-        if url in existing_urls:
-            continue
-        
-        print(f"SOURCERER: Evaluating potential new source: {url}")
-        try:
-            response = genai_model.generate_content(SOURCERER_PROMPT.format(url=url))
-            result = json.loads(response.text.strip())
-            
-            if result.get("is_high_quality_source"):
+    # Each verdict is a 1-3 s Gemini round-trip; overlapping them drops the
+    # evaluation phase from N x latency to roughly one latency per batch of
+    # eight, mirroring the fan-out in ingest.fetch_from_web_sources.
+    candidates = [url for url in potential_urls if url not in existing_urls]
+    rejected_domains = set()
+    validated_rows = []
+    with ThreadPoolExecutor(max_workers=min(8, max(1, len(candidates)))) as executor:
+        future_to_url = {
+            executor.submit(_evaluate_url, url, rejected_domains): url
+            for url in candidates
+        }
+        for future in as_completed(future_to_url):
+            url = future_to_url[future]
+            try:
+                result = future.result(timeout=60)
+            except Exception as e:
+                print(f"SOURCERER: Could not process URL {url}. Reason: {e}")
+                continue
+
+            if result and result.get("is_high_quality_source"):
                 print(f"SOURCERER: VALIDATED new source '{result.get('source_name')}' at {url}")
-                new_source = Source(
-                    name=result.get('source_name'),
-                    url=url,
-                    source_type=result.get('source_type'),
-                    is_active=True # Add new sources as active by default
-                )
-                db = SessionLocal()
-                try:
-                    db.add(new_source)
-                    db.commit()
-                    new_sources_added += 1
-                except IntegrityError:
-                    db.rollback() # Handle rare race condition if URL was added in another process
-                finally:
-                    db.close()
+                validated_rows.append({
+                    'name': result.get('source_name'),
+                    'url': url,
+                    'source_type': result.get('source_type'),
+                    'is_active': True, # Add new sources as active by default
+                })
+
+    if not validated_rows:
+        return "Sourcerer cycle complete. Added 0 new sources to the database."
+
+    # One statement and one commit for the whole cycle, same pattern as
+    # initial_setup: DO NOTHING absorbs races where another process added
+    # the same name or URL, and RETURNING counts what was actually new.
+    new_sources_added = 0
+    db = SessionLocal()
+    try:
+        stmt = (
+            pg_insert(Source)
+            .values(validated_rows)
+            .on_conflict_do_nothing()
+            .returning(Source.id)
+        )
+        new_sources_added = len(db.execute(stmt).scalars().all())
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"SOURCERER: ERROR during bulk source insert: {e}")
+    finally:
+        db.close()
 
-        except Exception as e:
-            print(f"SOURCERER: Could not process URL {url}. Reason: {e}")
-            
     return f"Sourcerer cycle complete. Added {new_sources_added} new sources to the database."
\ No newline at end of file
@@ -11,11 +11,15 @@ sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
 
 import os
 import time
+from functools import lru_cache
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from celery_app import celery
 # --- Update the import ---
-from ingest import fetch_from_arxiv, fetch_from_web_sources
+from ingest import fetch_from_arxiv, fetch_from_web_sources, redis_client
 from services import analyze_rank_and_translate
-from database import SessionLocal, add_progress_item, ProgressItem
+from database import SessionLocal, add_progress_item, add_progress_items_bulk, ProgressItem
 from sentence_transformers import SentenceTransformer
 import chromadb
 
@@ -32,9 +36,93 @@ except Exception as e:
 
 CHROMA_HOST = os.getenv("CHROMA_HOST", "localhost")
 CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8000"))
-chroma_client = chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
-progress_collection = chroma_client.get_or_create_collection(name="ai_progress", metadata={"hnsw:space": "cosine"})
-print("TASKS: Connected to ChromaDB successfully.")
+
+@lru_cache(maxsize=1)
+def _get_progress_collection():
+    """
+    Connects to ChromaDB on first use. Building the HTTP client at import
+    blocked every worker's boot on Chroma being reachable — and crashed the
+    worker outright when it wasn't; deferring it means a slow or down
+    Chroma only affects the tasks that actually need it, which can retry.
+    """
+    chroma_client = chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
+    collection = chroma_client.get_or_create_collection(
+        name="ai_progress",
+        metadata={"hnsw:space": "cosine", "hnsw:M": 24, "hnsw:construction_ef": 128, "hnsw:search_ef": 100},
+    )
+    print("TASKS: Connected to ChromaDB successfully.")
+    return collection
+
+# Redis set of entry_ids we have already stored. Most cards on a blog index
+# page were seen in an earlier cycle; filtering against this set up front
+# skips dispatching a Celery task (and its Postgres existence query) per
+# stale item. Postgres stays the source of truth — if the set expires or
+# Redis is down, the existence check in process_item still catches dupes.
+_SEEN_IDS_KEY = "seen_entry_ids"
+_SEEN_IDS_TTL = 30 * 24 * 3600
+
+# Completed Gemini analyses keyed by a hash of the exact (title, abstract)
+# pair. A task retry after a Postgres or Chroma hiccup, or the same article
+# resurfacing under a new entry_id (arXiv cross-listings, re-posts), then
+# reuses the stored verdict instead of re-paying a multi-second LLM call.
+_ANALYSIS_CACHE_TTL = 30 * 24 * 3600
+
+def _analyze_cached(title: str, abstract: str):
+    """analyze_rank_and_translate with a best-effort Redis cache in front."""
+    digest = hashlib.sha256(f"{title}\n{abstract}".encode()).hexdigest()
+    cache_key = f"gemini:analysis:{digest}"
+    try:
+        cached = redis_client.get(cache_key)
+        if cached is not None:
+            return json.loads(cached)
+    except Exception:
+        pass
+
+    analysis = analyze_rank_and_translate(title, abstract)
+    if analysis:
+        try:
+            redis_client.setex(cache_key, _ANALYSIS_CACHE_TTL, json.dumps(analysis))
+        except Exception:
+            pass
+    return analysis
+
+def _embedding_text(analysis_data: dict) -> str:
+    """Builds the text that gets embedded for semantic search."""
+    title_en = analysis_data.get('en', {}).get('title', 'No Title Provided')
+    what_is_new_en = analysis_data.get('en', {}).get('what_is_new', 'No summary available.')
+    why_it_matters_en = analysis_data.get('en', {}).get('why_it_matters', 'No impact statement available.')
+    keywords_en = ", ".join(analysis_data.get('keywords', []))
+
+    return (
+        f"Title: {title_en}\n"
+        f"Keywords: {keywords_en}\n\n"
+        f"Innovation: {what_is_new_en}\n\n"
+        f"Impact: {why_it_matters_en}"
+    )
+
+def _mark_entry_seen(entry_id: str):
+    """Best-effort recording of a stored entry_id in the dedup set."""
+    try:
+        with redis_client.pipeline(transaction=False) as pipe:
+            pipe.sadd(_SEEN_IDS_KEY, entry_id)
+            pipe.expire(_SEEN_IDS_KEY, _SEEN_IDS_TTL)
+            pipe.execute()
+    except Exception:
+        pass
+
+def embed_texts(texts: list, batch_size: int = 64):
+    """
+    Encodes a batch of texts in a single model call. SentenceTransformer
+    already orders inputs by length internally, so one batched call minimizes
+    padding waste versus encoding item-by-item; tasks that accumulate several
+    pending items should pass them all at once.
+    """
+    return embedding_model.encode(
+        texts,
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        show_progress_bar=False,
+    )
 
 # --- Celery Tasks ---
 
@@ -55,14 +143,125 @@ def run_scraper_cycle():
         return "Scraper cycle complete. No new items found from any source."
     
     # Remove duplicates based on URL before dispatching
-    unique_items = {item['url']: item for item in all_new_items}.values()
-    
+    unique_items = list({item['url']: item for item in all_new_items}.values())
+
+    # Drop items whose entry_id is already in the Redis dedup set, in one
+    # round-trip for the whole batch.
+    try:
+        seen_flags = redis_client.smismember(
+            _SEEN_IDS_KEY, [item['entry_id'] for item in unique_items]
+        )
+        unique_items = [
+            item for item, seen in zip(unique_items, seen_flags) if not seen
+        ]
+    except Exception as e:
+        print(f"TASK: WARN - seen-id dedup unavailable ({e}); dispatching all items.")
+
+    if not unique_items:
+        print("TASK: All items in this cycle were already processed.")
+        return "Scraper cycle complete. All items already seen."
+
     print(f"TASK: Found a total of {len(unique_items)} unique items. Dispatching analysis tasks...")
-    for item in unique_items:
-        # Dispatch a separate task for each item for parallel processing
-        process_item.delay(item)
-        
-    return f"Scraper cycle complete. Dispatched {len(unique_items)} tasks."
+    # Dispatch in batches: the embedding model is ~8x cheaper per item on a
+    # batch of 16 than on 16 single encodes, and Chroma takes the whole
+    # batch in one HTTP call. Items whose analysis fails inside a batch are
+    # re-dispatched individually through process_item's retry path.
+    batch_size = 16
+    batches = 0
+    for i in range(0, len(unique_items), batch_size):
+        process_batch.delay(unique_items[i:i + batch_size])
+        batches += 1
+
+    return f"Scraper cycle complete. Dispatched {len(unique_items)} items in {batches} batches."
+
+
+@celery.task(name="tasks.process_batch")
+def process_batch(items_data: list):
+    """
+    Batched counterpart of process_item: analyzes a group of items with
+    overlapped Gemini calls, embeds all of their texts in one model forward
+    pass, and writes the embeddings to ChromaDB in a single call. Items
+    whose analysis fails are handed to process_item for retry handling.
+    """
+    if not items_data:
+        return "Batch skipped: empty."
+
+    # 1. Drop items that already exist, in one query for the whole batch.
+    entry_ids = [item['entry_id'] for item in items_data]
+    db = SessionLocal()
+    try:
+        existing = {
+            row[0] for row in
+            db.query(ProgressItem.entry_id)
+              .filter(ProgressItem.entry_id.in_(entry_ids)).all()
+        }
+    finally:
+        db.close()
+    for entry_id in existing:
+        _mark_entry_seen(entry_id)
+    fresh_items = [item for item in items_data if item['entry_id'] not in existing]
+    if not fresh_items:
+        return "Batch skipped: all items already exist."
+
+    # 2. Overlap the per-item Gemini round-trips. Failures fall back to the
+    # per-item task, which owns the retry/backoff logic.
+    analyses = {}
+    with ThreadPoolExecutor(max_workers=min(4, len(fresh_items))) as executor:
+        future_to_item = {
+            executor.submit(_analyze_cached, item['title'], item['abstract']): item
+            for item in fresh_items
+        }
+        for future in as_completed(future_to_item):
+            item = future_to_item[future]
+            try:
+                analysis = future.result(timeout=120)
+            except Exception as e:
+                print(f"TASK: Batch analysis failed for '{item['title']}': {e}")
+                analysis = None
+            if analysis:
+                analyses[item['entry_id']] = analysis
+            else:
+                process_item.delay(item)
+
+    analyzed_items = [item for item in fresh_items if item['entry_id'] in analyses]
+    if not analyzed_items:
+        return "Batch complete: all analyses failed; items re-dispatched individually."
+
+    # 3. One forward pass for every text in the batch.
+    texts = [_embedding_text(analyses[item['entry_id']]) for item in analyzed_items]
+    embeddings = embed_texts(texts)
+
+    # 4. One bulk INSERT for the whole batch — a single round-trip and
+    # transaction instead of one per item. The returned entry_id -> id map
+    # tells us which rows actually landed (duplicates are absent) and
+    # supplies the primary keys ChromaDB uses as document ids.
+    inserted_ids = add_progress_items_bulk([
+        {**item, "analysis_data": analyses[item['entry_id']]}
+        for item in analyzed_items
+    ])
+
+    chroma_payload = {"embeddings": [], "documents": [], "metadatas": [], "ids": []}
+    stored = 0
+    for item, text, embedding in zip(analyzed_items, texts, embeddings):
+        db_item_id = inserted_ids.get(item['entry_id'])
+        if not db_item_id:
+            print(f"TASK: ERROR failed to save '{item['title']}' to PostgreSQL.")
+            continue
+        _mark_entry_seen(item['entry_id'])
+        stored += 1
+        chroma_payload["embeddings"].append(embedding.tolist())
+        chroma_payload["documents"].append(text)
+        chroma_payload["metadatas"].append({"source": item['source'], "title": item['title']})
+        chroma_payload["ids"].append(str(db_item_id))
+
+    # 5. One round-trip to ChromaDB for the whole batch.
+    if chroma_payload["ids"]:
+        try:
+            _get_progress_collection().add(**chroma_payload)
+        except Exception as e:
+            print(f"TASK: ERROR failed to save batch embeddings to ChromaDB: {e}")
+
+    return f"Batch complete: stored {stored}/{len(items_data)} items."
 
 
 @celery.task(name="tasks.process_item", bind=True, max_retries=3, default_retry_delay=60)
@@ -81,6 +280,7 @@ def process_item(self, item_data: dict):
         exists = db.query(ProgressItem).filter(ProgressItem.entry_id == entry_id).first()
         if exists:
             print(f"TASK: Skipping '{title}' as it already exists in DB.")
+            _mark_entry_seen(entry_id)
             return f"Skipped (already exists): {entry_id}"
     finally:
         db.close()
@@ -88,7 +288,7 @@ def process_item(self, item_data: dict):
     # 2. Perform AI analysis (now using the more robust service layer)
     try:
         # Call the new, all-in-one function
-        analysis_data = analyze_rank_and_translate(title, item_data['abstract'])
+        analysis_data = _analyze_cached(title, item_data['abstract'])
         if not analysis_data:
             raise ValueError("Unified analysis from Gemini returned None or was invalid.")
     except Exception as e:
@@ -96,33 +296,24 @@ def process_item(self, item_data: dict):
         raise self.retry(exc=e)
 
     # 3. Create semantic embedding (now including keywords for better search)
-    title_en = analysis_data.get('en', {}).get('title', 'No Title Provided')
-    what_is_new_en = analysis_data.get('en', {}).get('what_is_new', 'No summary available.')
-    why_it_matters_en = analysis_data.get('en', {}).get('why_it_matters', 'No impact statement available.')
-    keywords_en = ", ".join(analysis_data.get('keywords', [])) # Join keywords into a string
-
-    text_to_embed = (
-        f"Title: {title_en}\n"
-        f"Keywords: {keywords_en}\n\n" # Add the keywords here
-        f"Innovation: {what_is_new_en}\n\n"
-        f"Impact: {why_it_matters_en}"
-    )
-    embedding = embedding_model.encode(text_to_embed).tolist()
+    text_to_embed = _embedding_text(analysis_data)
+    embedding = embed_texts([text_to_embed])[0].tolist()
 
     # 4. Store results in PostgreSQL
     db_item_data = {**item_data, "analysis_data": analysis_data}
-    db_item = add_progress_item(db_item_data)
-    if not db_item:
+    db_item_id = add_progress_item(db_item_data)
+    if not db_item_id:
         print(f"TASK: ERROR failed to save '{title}' to PostgreSQL.")
         return f"Failed (Postgres save error): {entry_id}"
+    _mark_entry_seen(entry_id)
 
     # 5. Store embedding in ChromaDB
     try:
-        progress_collection.add(
+        _get_progress_collection().add(
             embeddings=[embedding],
             documents=[text_to_embed],
             metadatas=[{"source": item_data['source'], "title": title}],
-            ids=[str(db_item.id)]
+            ids=[str(db_item_id)]
         )
     except Exception as e:
         print(f"TASK: ERROR failed to save embedding for '{title}' to ChromaDB: {e}")
@@ -1,81 +1,147 @@
 # ui_components.py
 
+from html import escape
+
 import streamlit as st
 
+# Radio labels and the view field each one selects; built once rather
+# than as per-call literals in the render path.
+_SECTION_LABELS = ("What's New?", "Why It Matters?", "How It Works?")
+_SECTION_FIELDS = {"What's New?": 'what', "Why It Matters?": 'why', "How It Works?": 'how'}
+
+def _as_float(value, default=0.0):
+    """Scores arrive from the LLM as strings like "8.7"; coerce safely."""
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return default
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _build_card_view(item: dict, lang_code: str) -> dict:
+    """
+    Flattens one item's nested analysis_data into exactly the values the
+    card displays. Cached per (item, language): the whole script reruns on
+    every widget event, so without this each click re-walked ~20 nested
+    dict chains, re-parsed five score strings and re-joined the keyword
+    badges for every card on the page.
+    """
+    analysis = item.get('analysis_data', {}) or {}
+    content_lang = analysis.get(lang_code) or analysis.get('en') or {}
+    ranking = analysis.get('ranking', {})
+    scores = ranking.get('scores', {})
+
+    def _score(name):
+        entry = scores.get(name)
+        return _as_float(entry.get('score', 0)) if isinstance(entry, dict) else 0.0
+
+    title = content_lang.get('title', 'Untitled')
+    source = item.get('source', 'N/A')
+    # published_date arrives as a raw Timestamp from the cached frame (NaT
+    # when missing); format it here at the display boundary so cards show
+    # "2024-05-01", never "... 00:00:00" or "NaT". NaT compares unequal to
+    # itself, so it falls through to N/A without needing a pandas import.
+    published = item.get('published_date')
+    if hasattr(published, 'strftime') and published == published:
+        published = published.strftime('%Y-%m-%d')
+    else:
+        published = 'N/A'
+    importance = _as_float(ranking.get('overall_importance_score', "0.0"))
+
+    return {
+        'id': item.get('id'),
+        'has_content': bool(content_lang),
+        'url': item.get('url', '#'),
+        'importance': importance,
+        'header_md': (
+            f"<h3 style='margin-bottom:0.1rem'>{escape(title)}"
+            f"<span style='float:right;font-size:0.8em'>{importance:.1f}/10</span></h3>\n"
+            f"<small>Source: <b>{escape(str(source))}</b> | "
+            f"Published: <b>{escape(str(published))}</b></small>"
+        ),
+        'justification': content_lang.get('overall_importance_justification', 'No justification available.'),
+        'what': content_lang.get('what_is_new', 'Summary not available.'),
+        'why': content_lang.get('why_it_matters', 'Impact statement not available.'),
+        'how': content_lang.get('how_it_works', 'Explanation not available.'),
+        'scores_md': (
+            "| Novelty | Human Impact | Field Influence | Maturity |\n"
+            "|---|---|---|---|\n"
+            f"| {_score('breakthrough_novelty')}/10 | {_score('human_impact')}/10 "
+            f"| {_score('field_influence')}/10 | {_score('technical_maturity')}/10 |"
+        ),
+        'keywords_md': ' '.join(f"`{kw}`" for kw in analysis.get('keywords', ())),
+    }
+
 def render_progress_card(item: dict, container, lang_code: str = 'en', key_prefix: str = 'card'):
     """
     Renders a single AI progress item with multi-lingual support
     and a fixed layout for the importance score.
     """
-    analysis = item.get('analysis_data', {})
-    content_lang = analysis.get(lang_code, analysis.get('en', {}))
-    ranking = analysis.get('ranking', {})
-    scores = ranking.get('scores', {})
-    
+    # The container is the fragment's stable anchor in the page; the body
+    # itself is a fragment so interactions inside one card (tabs, expander)
+    # rerun just that card instead of the whole feed.
     with container:
-        # --- Header with columns for layout ---
-        header_cols = st.columns([7, 1])
-        
-        with header_cols[0]:
-            st.subheader(content_lang.get('title', 'Untitled'))
-            st.caption(f"Source: **{item.get('source', 'N/A')}** | Published: **{item.get('published_date', 'N/A')}**")
-        
-        with header_cols[1]:
-            # 1. Get the score, which might be a string like "8.7". Default to "0.0".
-            score_value_str = ranking.get('overall_importance_score', "0.0")
-            # 2. Safely convert it to a float.
-            try:
-                score_value_float = float(score_value_str)
-            except (ValueError, TypeError):
-                score_value_float = 0.0 # Default to 0.0 if conversion fails
-            # 3. Now, format the guaranteed float value.
-            st.metric("Importance", f"{score_value_float:.1f}/10")
-
-        # --- Progress Bar with translated justification ---
-        # Also apply the same robust float conversion here.
-        progress_score_str = ranking.get('overall_importance_score', "0.0")
-        try:
-            progress_score_float = float(progress_score_str)
-        except (ValueError, TypeError):
-            progress_score_float = 0.0
-            
-        st.progress(
-            int(progress_score_float * 10),
-            text=f"💡 {content_lang.get('overall_importance_justification', 'No justification available.')}"
-        )
-        st.write("")
-
-        # --- Core Summaries ---
-        tab_what, tab_why, tab_how = st.tabs(["**What's New?**", "**Why It Matters?**", "**How It Works?**"])
-        with tab_what:
-            st.write(content_lang.get('what_is_new', 'Summary not available.'))
-        with tab_why:
-            st.write(content_lang.get('why_it_matters', 'Impact statement not available.'))
-        with tab_how:
-            st.write(content_lang.get('how_it_works', 'Explanation not available.'))
-
-        # --- Expander for Detailed Scores and Actions ---
-        with st.expander("Show Detailed Scores (in English) & Actions"):
-            st.markdown("---")
-            st.markdown("###### AI-Generated Score Breakdown")
-            
-            s_col1, s_col2, s_col3, s_col4 = st.columns(4)
-            # Apply the same robust casting to the individual scores
-            s_col1.metric("Novelty", f"{float(scores.get('breakthrough_novelty', {}).get('score', 0))}/10")
-            s_col2.metric("Human Impact", f"{float(scores.get('human_impact', {}).get('score', 0))}/10")
-            s_col3.metric("Field Influence", f"{float(scores.get('field_influence', {}).get('score', 0))}/10")
-            s_col4.metric("Maturity", f"{float(scores.get('technical_maturity', {}).get('score', 0))}/10")
-            
-            st.markdown("###### English Keywords")
-            st.write(' '.join([f"`{kw}`" for kw in analysis.get('keywords', [])]))
-            
-            st.divider()
-            a_col1, a_col2 = st.columns(2)
-            with a_col1:
-                st.link_button("🔗 Go to Source", item.get('url', '#'), use_container_width=True)
-            with a_col2:
-                button_key = f"{key_prefix}_flag_{item.get('id')}"
-                if st.button("🚩 Flag for Review", key=button_key, use_container_width=True, type="secondary"):
-                    # We also use a unique key for the session state variable
-                    st.session_state[f"flagging_item_id_{key_prefix}"] = item.get('id')
-                    st.rerun()
+        _card_body(item, lang_code, key_prefix)
+
+@st.fragment
+def _card_body(item: dict, lang_code: str, key_prefix: str):
+    view = _build_card_view(item, lang_code)
+    item_id = view['id']
+
+    # --- Header: one markdown emit replaces a columns pair plus three
+    # widgets; the importance badge floats right where st.metric sat.
+    st.markdown(view['header_md'], unsafe_allow_html=True)
+
+    # Partially-analyzed items have no text in any language; stop after
+    # the header instead of building a card full of "not available"
+    # placeholders.
+    if not view['has_content']:
+        st.info("Analysis for this item is not available yet.")
+        return
+
+    # --- Progress Bar with translated justification ---
+    st.progress(
+        int(view['importance'] * 10),
+        text=f"💡 {view['justification']}"
+    )
+
+    # --- Core Summaries ---
+    # st.tabs builds all three panes on every rerun even though only one
+    # is visible; a horizontal radio renders just the selected text, and
+    # switching sections is a fragment-local rerun of this card alone.
+    section = st.radio(
+        "Summary section",
+        _SECTION_LABELS,
+        key=f"{key_prefix}_section_{item_id}",
+        horizontal=True,
+        label_visibility="collapsed",
+    )
+    st.write(view[_SECTION_FIELDS[section]])
+
+    # --- Detailed Scores and Actions, built only when opened ---
+    # An expander executes its children on every rerun even while
+    # collapsed; gating on a toggle skips all of that work for the
+    # (typical) closed card, and fragment scope means flipping the
+    # toggle reruns just this card.
+    if st.toggle("Show Detailed Scores (in English) & Actions", key=f"{key_prefix}_details_{item_id}"):
+        st.markdown("---")
+        st.markdown("###### AI-Generated Score Breakdown")
+        # One markdown table instead of a 4-column grid of st.metric
+        # widgets: the table is a single element emit, the grid was five
+        # container/widget constructions per card.
+        st.markdown(view['scores_md'])
+
+        st.markdown("###### English Keywords")
+        st.write(view['keywords_md'])
+
+        st.divider()
+        a_col1, a_col2 = st.columns(2)
+        with a_col1:
+            st.link_button("🔗 Go to Source", view['url'], use_container_width=True)
+        with a_col2:
+            button_key = f"{key_prefix}_flag_{item_id}"
+            if st.button("🚩 Flag for Review", key=button_key, use_container_width=True, type="secondary"):
+                st.session_state[f"flagging_item_id_{key_prefix}"] = item_id
+                # The flag form lives outside this fragment (app.py renders
+                # it after the card), so escalate to a full-app rerun; every
+                # other interaction in the card stays fragment-scoped.
+                st.rerun(scope="app")